@@ -21,28 +21,34 @@
 # DEALINGS IN THE SOFTWARE.
 import os
 import os.path
-import subprocess
+import re
+import time
+import threading
 import sublime
 import sublime_plugin
-import re
 import webbrowser
-
-# Some global vars:
-jump_to_action = ''
+from SymfonyCommanderCore import (BackgroundLoader, CompletionSession, ConsoleJob, DAEMON_SETTINGS, DaemonClient,
+    DirectoryResolver, Indexer, JobScheduler, ProjectIndex, ServiceDefinition, ShardedTestRun, classifyFile, containsBundle,
+    controllerOf, findTestFiles, indexSettings, infoIndex, isProjectRoot, isTranslationContext, serviceIndex, stats,
+    templateName, topMatches, workerCanRun)
 
 
-class SymfonyCommanderBase:
+class SymfonyCommanderBase(Indexer):
 
-    base_directory = ''
     api_search_version = 'master'  # or somthing like v2.0.14 ...
     doc_search_version = 'master'  # or  2.0
 
     cache_name = 'default'
-    routes = {}
-    containers = {}
-    entities = {}
-    templates = {}
-    common_snippets = {}
+    schedulers = {}
+    test_durations = {}
+    output_owner = None
+    watching = False
+    root_resolver = DirectoryResolver(isProjectRoot)
+    bundle_resolver = DirectoryResolver(containsBundle)
+
+    loader = BackgroundLoader(lambda callback: sublime.set_timeout(callback, 0))
+    completion_daemon = False
+    daemon = None
 
     symfony_api_url = 'http://api.symfony.com/{v}/index.html?q={s}&src=SymfonyCommander'
     symfony_doc_url = 'http://symfony.com/search?version={v}&q={s}&src=SymfonyCommander'
@@ -62,6 +68,7 @@ class SymfonyCommanderBase:
     )
 
     def loadSettings(self):
+        started = time.time()
         self.base_directory = ''
         if self.view:
             project_settings = self.view.settings().get('SymfonyCommander', {})
@@ -71,216 +78,223 @@ class SymfonyCommanderBase:
                 #try to find it somewhere upwards:
                 view_name = self.view.file_name()
                 if view_name:
-                    dir_name = os.path.dirname(view_name)
-                    found_root = False
-                    reached_end = False
-                    while not found_root and not reached_end:
-                        for file in os.listdir(dir_name):
-                            if file == "app" and os.path.isdir(dir_name + "/" + file):
-                                #found an app dir
-                                if os.path.exists(dir_name + "/" + file + '/console'):
-                                    self.base_directory = dir_name
-                                    found_root = True
-                        #travers up
-                        old_dir = dir_name
-                        dir_name = os.path.dirname(dir_name)
-                        if dir_name == old_dir:
-                            reached_end = True
-
-            #Init Cache for the Project
-            if self.base_directory:
-                if self.base_directory not in SymfonyCommanderBase.containers:
-                    SymfonyCommanderBase.containers[self.base_directory] = []
-                if self.base_directory not in SymfonyCommanderBase.routes:
-                    SymfonyCommanderBase.routes[self.base_directory] = []
-                if self.base_directory not in SymfonyCommanderBase.entities:
-                    SymfonyCommanderBase.entities[self.base_directory] = []
-                if self.base_directory not in SymfonyCommanderBase.templates:
-                    SymfonyCommanderBase.templates[self.base_directory] = []
-                if self.base_directory not in SymfonyCommanderBase.common_snippets:
-                    SymfonyCommanderBase.common_snippets[self.base_directory] = []
+                    resolver = SymfonyCommanderBase.root_resolver
+                    walks = resolver.walks
+                    self.base_directory = resolver.resolve(os.path.dirname(view_name)) or ''
+                    if self.base_directory:
+                        stats.since(self.base_directory, 'root discovery', started)
+                        stats.count(self.base_directory, resolver.walks == walks and 'root cache hit' or 'root cache miss')
 
         s = sublime.load_settings("SymfonyCommander.sublime-settings")
-        self.php_command = s.get('php_command')
+        self.applySettings(s)
         if s.get('api_search_version'):
             self.api_search_version = s.get('api_search_version')
         if s.get('doc_search_version'):
             self.doc_search_version = s.get('doc_search_version')
+        self.output_max_chars = s.get('output_max_chars', 200000)
+        self.max_concurrent_jobs = s.get('max_concurrent_jobs', 2)
+        self.phpunit_shards = s.get('phpunit_shards', 1)
+        self.api_index = s.get('api_index', True)
+        self.completion_daemon = s.get('completion_daemon', False)
+        self.daemon_timeout = s.get('daemon_timeout_ms', 200) / 1000.0
+        if self.completion_daemon:
+            self.index_settings = indexSettings(s, DAEMON_SETTINGS)
+            daemon = SymfonyCommanderBase.daemon
+            port = s.get('daemon_port', 48723)
+            command = s.get('daemon_command', 'python')
+            if not daemon or daemon.port != port or daemon.command != command:
+                config_path = os.path.join(sublime.packages_path(), 'User', 'SymfonyCommander.daemon.json')
+                daemon = SymfonyCommanderBase.daemon = DaemonClient(port, config_path, command, s.get('daemon_idle_minutes', 60) * 60)
+            daemon.configure(s, self.cacheDirectory())
+
+        #Init Cache for the Project
+        if self.base_directory:
+            # the completion indexes are kept by the daemon
+            sections = ProjectIndex.sections
+            if self.completion_daemon:
+                sections = ()
+            if self.openProject(sections):
+                self.startWatching()
+            stats.since(self.base_directory, 'loadSettings', started)
+
+    def cacheDirectory(self):
+        return os.path.join(sublime.packages_path(), 'User', 'SymfonyCommander.cache')
+
+    def reportError(self, base_directory, message):
+        Indexer.reportError(self, base_directory, message)
+        sublime.set_timeout(lambda: sublime.status_message('SymfonyCommander: ' + message), 0)
+
+    def daemonRequest(self, method, params, timeout, wait=True):
+        # Asks the completion daemon about the current project, None if it
+        # is not used or did not answer in time. Without wait the request
+        # is sent from a worker thread and its answer is dropped.
+        if not self.completion_daemon or not self.base_directory:
+            return None
+        params['base_directory'] = self.base_directory
+        params['settings'] = self.index_settings
+        if not wait:
+            return SymfonyCommanderBase.daemon.notify(method, params, timeout)
+        return SymfonyCommanderBase.daemon.request(method, params, timeout)
+
+    def lookupIndex(self, section, on_done):
+        # Calls on_done with the routes or services index for a quick panel,
+        # from the daemon if it is used, else from the project
+        def load_local():
+            load = section == 'routes' and self.loadRoutes or self.loadContainer
+            load(on_done=lambda: on_done(getattr(self.project(), section)))
+
+        if not self.completion_daemon:
+            return load_local()
+
+        def work():
+            entries = self.daemonRequest('lookup', {'section': section}, 300)
+            if entries is None:
+                sublime.set_timeout(load_local, 0)
+            elif section == 'routes':
+                index = infoIndex(entries, ' [Route]')
+                sublime.set_timeout(lambda: on_done(index), 0)
+            else:
+                index = serviceIndex([(entry[0], ServiceDefinition(*entry[1:])) for entry in entries])
+                sublime.set_timeout(lambda: on_done(index), 0)
+
+        thread = threading.Thread(target=work)
+        thread.setDaemon(True)
+        thread.start()
+
+    def startWatching(self):
+        if self.watch_interval and not SymfonyCommanderBase.watching:
+            SymfonyCommanderBase.watching = True
+            sublime.set_timeout(pollWatchers, int(self.watch_interval * 1000))
 
     def getCurrentBundleFolder(self):
         view_name = self.view.file_name()
-        bundle_folder = False
         if view_name:
-            dir_name = os.path.dirname(view_name)
-            found_folder = False
-            reached_end = False
-            while not found_folder and not reached_end:
-                for file in os.listdir(dir_name):
-                    if file.endswith('Bundle') and os.path.isdir(dir_name + "/" + file):
-                        bundle_folder = dir_name
-                        found_folder = True
-                #travers up
-                old_dir = dir_name
-                dir_name = os.path.dirname(dir_name)
-                if dir_name == old_dir:
-                    reached_end = True
-        return bundle_folder
-
-    def callSymfony(self, command, quiet=False):
+            return SymfonyCommanderBase.bundle_resolver.resolve(os.path.dirname(view_name))
+        return False
+
+    def runSymfony(self, command):
+        # Runs a console command and shows its output in the output panel
+        # while it is running
         self.loadSettings()
         if not self.base_directory:
-            if not quiet:
-                self.output("Can't find the root directory of the symfony project. Please have a look at the README. You can find it here: https://github.com/pdaether/Sublime-SymfonyCommander")
+            self.output("Can't find the root directory of the symfony project. Please have a look at the README. You can find it here: https://github.com/pdaether/Sublime-SymfonyCommander")
             return
-        os.chdir(self.base_directory)
-        # CMD:
-        if not self.php_command:
-            command = "php app/console --no-ansi " + command
-        else:
-            command = self.php_command + " app/console --no-ansi " + command
-        result, e = subprocess.Popen(command, stdout=subprocess.PIPE, shell=True, cwd=self.base_directory).communicate()
-        if e:
-            return e
+        base_directory = self.base_directory
+        job = ConsoleJob(self.consoleCommand(command), base_directory, self.output_max_chars, command)
+        if self.console_worker and workerCanRun(command, self.cache_env):
+            # cancelling stops the worker, it is started again for the next command
+            job.function = lambda: self.consoleOutput(base_directory, command, job)
+            job.stopper = self.consoleWorker(base_directory).stop
         else:
-            if not result and not quiet:
-                result = "Finished " + command
-            return result
+            self.stopConsoleWorker(base_directory, command)
+        self.startJob(job)
 
-    def callPhpunit(self, command):
+    def runPhpunit(self, command):
         self.loadSettings()
         if not self.base_directory:
             self.output("Can't find the root directory of the symfony project. Please have a look at the README. You can find it here: https://github.com/pdaether/Sublime-SymfonyCommander")
             return
-        os.chdir(self.base_directory)
         command = "phpunit " + command
-        result, e = subprocess.Popen(command, stdout=subprocess.PIPE, shell=True, cwd=self.base_directory).communicate()
-        if e:
-            return e
-        else:
-            if not result:
-                result = "Finished " + command
-            return result
+        self.startJob(ConsoleJob(command, self.base_directory, self.output_max_chars))
 
-    def loadRoutes(self, force=False):
-        if not force and len(SymfonyCommanderBase.routes[self.base_directory]) > 0:
-            return
-        routes_string = self.callSymfony('router:debug', True)
-        if not routes_string:
-            return
-        lines = routes_string.splitlines()
-        SymfonyCommanderBase.route_info = []
-        SymfonyCommanderBase.routes[self.base_directory] = []
-        for idx, val in enumerate(lines):
-            if not val.startswith('Name') and not val.startswith('[router]'):
-                route_name, restwords = val.split(' ', 1)
-                SymfonyCommanderBase.route_info.append([route_name, restwords.strip()])
-                SymfonyCommanderBase.routes[self.base_directory].append(route_name)
-
-    def loadContainer(self, force=False):
-        if not force and len(SymfonyCommanderBase.containers[self.base_directory]) > 0:
-            return
-        container_string = self.callSymfony('container:debug', True)
-        if not container_string:
-            return
-        lines = container_string.splitlines()
-        SymfonyCommanderBase.container_info = []
-        SymfonyCommanderBase.containers[self.base_directory] = []
-        for idx, val in enumerate(lines):
-            if not val.startswith('Name') and not val.startswith('[container]'):
-                container_name, restwords = val.split(' ', 1)
-                SymfonyCommanderBase.container_info.append([container_name, restwords.strip()])
-                SymfonyCommanderBase.containers[self.base_directory].append(container_name)
-
-    def loadEntities(self, force=False):
-        self.loadSettings()
-        if not force and len(SymfonyCommanderBase.entities[self.base_directory]) > 0:
-            return
-        if not self.base_directory:
-            return
-        SymfonyCommanderBase.entities[self.base_directory] = []
-        src_dir = self.base_directory + "/src"
-        if not os.path.isdir(src_dir):
-            return
-        for file in os.listdir(src_dir):
-            company_dir = src_dir + "/" + file
-            prefix = file
-            if os.path.isdir(company_dir):
-                for file in os.listdir(company_dir):
-                    bundle_dir = company_dir + "/" + file
-                    prefix = prefix + file
-                    if self.common_snippets[self.base_directory].count(prefix) < 1:
-                        self.common_snippets[self.base_directory].append(prefix)
-                    if os.path.isdir(bundle_dir):
-                        entities_dir = bundle_dir + "/Entity"
-                        if os.path.isdir(entities_dir):
-                            for file in os.listdir(entities_dir):
-                                file_match = re.search(r'^((.)(?!Repository))*\.php$', file)
-                                if file_match:
-                                    entity_name_match = re.search(r'^(.*)\.php$', file)
-                                    SymfonyCommanderBase.entities[self.base_directory].append(entity_name_match.group(1))
-                                    SymfonyCommanderBase.entities[self.base_directory].append(prefix + ':' + entity_name_match.group(1))
-
-    def loadTemplates(self, force=False):
+    def runPhpunitSharded(self, path):
+        # Runs all tests below path in phpunit_shards processes at once
         self.loadSettings()
-        if not force and len(SymfonyCommanderBase.templates[self.base_directory]) > 0:
-            return
         if not self.base_directory:
             return
-        SymfonyCommanderBase.templates[self.base_directory] = []
-        src_dir = self.base_directory + "/src"
-        if not os.path.isdir(src_dir):
-            return
-        for file in os.listdir(src_dir):
-            company_dir = src_dir + "/" + file
-            prefix = file
-            if os.path.isdir(company_dir):
-                for file in os.listdir(company_dir):
-                    bundle_dir = company_dir + "/" + file
-                    prefix = prefix + file
-                    #the short identifier of the bundle:
-                    if self.common_snippets[self.base_directory].count(prefix) < 1:
-                        self.common_snippets[self.base_directory].append(prefix)
-                    if os.path.isdir(bundle_dir):
-                        tpl_dir = bundle_dir + "/Resources/views"
-                        if os.path.isdir(tpl_dir):
-                            results = self.getTemplateNames(tpl_dir, prefix + ':', [])
-                            for result in results:
-                                SymfonyCommanderBase.templates[self.base_directory].append(result)
-                            # for file in os.listdir(tpl_dir):
-                            #     file_match = re.search(r'^(.*)\.(twig|php)$', file)
-                            #     if file_match:
-                            #         SymfonyCommanderBase.templates[self.base_directory].append(file_match.group(0))
-                            #         SymfonyCommanderBase.templates[self.base_directory].append(prefix + ':' + file_match.group(0))
-
-    def getTemplateNames(self, dir, prefix, results):
-        for file in os.listdir(dir):
-            file_match = re.search(r'^(.*)\.(twig|php)$', file)
-            if file_match:
-                # results.append(file_match.group(0))
-                results.append(prefix + ':' + file_match.group(0))
-            if os.path.isdir(dir + "/" + file):
-                if re.match(r'.*:$', prefix):
-                    results = self.getTemplateNames(dir + "/" + file, prefix + file, results)
+        base_directory = self.base_directory
+        files = findTestFiles(path)
+        if self.phpunit_shards < 2 or len(files) < 2:
+            return self.runPhpunit(' -c app ' + path)
+        durations = SymfonyCommanderBase.test_durations.get(base_directory)
+        if durations is None:
+            cache = self.project().disk_cache
+            durations = cache and cache.get('phpunit', '') or {}
+            SymfonyCommanderBase.test_durations[base_directory] = durations
+        test_run = ShardedTestRun(base_directory, files, self.phpunit_shards, durations)
+
+        def run():
+            summary = test_run.run()
+            self.storeCache(base_directory, 'phpunit', '', dict(durations))
+            return summary
+
+        job = ConsoleJob('phpunit -c app ' + path, base_directory, self.output_max_chars, function=run)
+        job.stopper = test_run.cancel
+        self.startJob(job)
+
+    def jobScheduler(self, base_directory):
+        scheduler = SymfonyCommanderBase.schedulers.get(base_directory)
+        if not scheduler:
+            scheduler = JobScheduler()
+            SymfonyCommanderBase.schedulers[base_directory] = scheduler
+        scheduler.max_jobs = self.max_concurrent_jobs
+        return scheduler
+
+    def startJob(self, job):
+        # Queues a ConsoleJob for the project and copies its output into the
+        # output panel in batches while it is running
+        scheduler = self.jobScheduler(job.cwd)
+        queued = scheduler.submit(job)
+        if queued is not job:
+            sublime.status_message('SymfonyCommander: ' + job.title + ' is already queued')
+            return queued
+        window = self.view.window()
+        panel = window.get_output_panel('SymfonyCommander')
+        panel.set_syntax_file('Packages/Text/Plain text.tmLanguage')
+        window.run_command("show_panel", {"panel": "output.SymfonyCommander"})
+        if job.isWaiting():
+            sublime.status_message('SymfonyCommander: queued ' + job.title)
+
+        def flush():
+            scheduler.schedule()
+            if job.isWaiting():
+                sublime.set_timeout(flush, 100)
+                return
+            finished = job.finished is not None
+            text = job.takeOutput()
+            if finished:
+                if job.cancelled:
+                    text += "\n[Cancelled " + job.title + "]\n"
                 else:
-                    results = self.getTemplateNames(dir + "/" + file, prefix + '/' + file, results)
-        return results
+                    text += "\n[Finished %s in %.1fs]\n" % (job.title, job.duration())
+            if text:
+                if SymfonyCommanderBase.output_owner is not job:
+                    # several jobs may write into the panel at the same time
+                    SymfonyCommanderBase.output_owner = job
+                    text = "[" + job.title + "]\n" + text
+                self.appendOutput(panel, text)
+            if finished:
+                scheduler.schedule()
+            else:
+                sublime.set_timeout(flush, 100)
+
+        sublime.set_timeout(flush, 100)
+        return job
 
-    def clearCache(self):
-        SymfonyCommanderBase.containers[self.base_directory] = []
-        SymfonyCommanderBase.routes[self.base_directory] = []
-        SymfonyCommanderBase.entities[self.base_directory] = []
-        SymfonyCommanderBase.templates[self.base_directory] = []
-        SymfonyCommanderBase.common_snippets[self.base_directory] = []
+    def appendOutput(self, panel, text):
+        # Appends to an output panel and drops the beginning of the panel
+        # once it holds more than output_max_chars characters
+        panel.set_read_only(False)
+        edit = panel.begin_edit()
+        panel.insert(edit, panel.size(), text)
+        overflow = panel.size() - self.output_max_chars
+        if self.output_max_chars and overflow > 0:
+            panel.erase(edit, sublime.Region(0, overflow))
+        panel.end_edit(edit)
+        panel.set_read_only(True)
+        panel.show(panel.size())
 
     def output(self, value):
         self.multi_line_output(value)
 
-    def multi_line_output(self, value, panel_name='SymfonyCommander'):
+    def multi_line_output(self, value, panel_name='SymfonyCommander', clear=False):
         # Create the output Panel
         panel = self.view.window().get_output_panel(panel_name)
         panel.set_read_only(False)
         panel.set_syntax_file('Packages/Text/Plain text.tmLanguage')
         edit = panel.begin_edit()
+        if clear:
+            panel.erase(edit, sublime.Region(0, panel.size()))
         panel.insert(edit, panel.size(), value)
         panel.end_edit(edit)
         panel.set_read_only(True)
@@ -294,6 +308,38 @@ class SymfonyCommanderBase:
         self.loadSettings()
         return self.symfony_api_url.format(v=self.api_search_version, s=text)
 
+    def searchApi(self, text):
+        # Shows the definitions of text from the API index of the project
+        # and opens the selected one. The online API is used for projects
+        # without vendor/symfony, when nothing was found or when it is
+        # selected in the list.
+        url = self.getApiUrl(text)
+        base_directory = self.base_directory
+        window = self.view and self.view.window()
+        if not self.api_index or not base_directory or not window or not os.path.isdir(base_directory + "/vendor/symfony"):
+            self.open_url(url)
+            return
+        symbols = []
+
+        def on_select(num):
+            if num == len(symbols):
+                self.open_url(url)
+            elif num != -1:
+                window.open_file(base_directory + "/" + symbols[num][2] + ":" + str(symbols[num][3]), sublime.ENCODED_POSITION)
+
+        def show_symbols():
+            symbols.extend(self.project(base_directory).api.search(text))
+            if not symbols:
+                self.open_url(url)
+                return
+            items = [[name, kind + '  ' + path + ':' + str(line)] for name, kind, path, line in symbols]
+            items.append(['Search api.symfony.com for "' + text + '"', url])
+            window.show_quick_panel(items, on_select, sublime.MONOSPACE_FONT)
+
+        if not self.project().api.loaded:
+            sublime.status_message('SymfonyCommander: indexing vendor/symfony ...')
+        self.loadApi(on_done=show_symbols)
+
     def getDocumentationUrl(self, text):
         self.loadSettings()
         return self.symfony_doc_url.format(v=self.doc_search_version, s=text)
@@ -315,7 +361,9 @@ class SymfonyCommander(SymfonyCommanderBase, sublime_plugin.TextCommand):
 
 class SymfonyCommanderClearCacheCommand(SymfonyCommander):
     def run(self, edit):
+        self.loadSettings()
         self.clearCache()
+        self.daemonRequest('clear', {}, 5, False)
 
     def is_enabled(self):
         return True
@@ -323,9 +371,7 @@ class SymfonyCommanderClearCacheCommand(SymfonyCommander):
 
 class SymfonyCommanderExecuteCommand(SymfonyCommander):
     def run(self, edit, command):
-        result = self.callSymfony(command)
-        if result:
-            self.output(result)
+        self.runSymfony(command)
 
 
 class SymfonyCommanderExecuteArgumentsCommand(SymfonyCommander):
@@ -334,9 +380,7 @@ class SymfonyCommanderExecuteArgumentsCommand(SymfonyCommander):
         sublime.active_window().show_input_panel("Arguments", arguments, self.on_input, None, None)
 
     def on_input(self, message):
-        result = self.callSymfony(self.command + ' ' + message)
-        if result:
-            self.output(result)
+        self.runSymfony(self.command + ' ' + message)
 
 
 # Command to run with arguments
@@ -345,89 +389,278 @@ class SymfonyCommanderAsseticDumpArgumentsCommand(SymfonyCommander):
         sublime.active_window().show_input_panel("Arguments", "--env=dev --no-debug --watch --force --period=30", self.on_input, None, None)
 
     def on_input(self, message):
-        self.output(self.callSymfony('assetic:dump ' + message))
+        self.runSymfony('assetic:dump ' + message)
+
+
+class SymfonyCommanderCancelCommand(SymfonyCommander):
+    def run(self, edit):
+        jobs = []
+        for scheduler in SymfonyCommanderBase.schedulers.values():
+            jobs.extend(scheduler.activeJobs())
+        if len(jobs) == 1:
+            jobs[0].cancel()
+            return
+
+        def on_select_job(num):
+            if num != -1:
+                jobs[num].cancel()
+
+        self.view.window().show_quick_panel([[job.title, job.status()] for job in jobs], on_select_job)
+
+    def is_enabled(self):
+        for scheduler in SymfonyCommanderBase.schedulers.values():
+            if scheduler.activeJobs():
+                return True
+        return False
+
+
+class SymfonyCommanderShowJobsCommand(SymfonyCommander):
+    def run(self, edit):
+        self.loadSettings()
+        scheduler = SymfonyCommanderBase.schedulers.get(self.base_directory)
+        lines = ['%-12s %8s %8s  %s' % ('Status', 'Waited', 'Took', 'Command')]
+        for job in scheduler and scheduler.jobs() or []:
+            lines.append('%-12s %7.1fs %7.1fs  %s' % (job.status(), job.waited(), job.duration(), job.title))
+        self.multi_line_output('\n'.join(lines) + '\n', 'SymfonyCommander Jobs', True)
+
+
+class SymfonyCommanderShowStatsCommand(SymfonyCommander):
+    def run(self, edit, reset=False):
+        self.loadSettings()
+        if reset:
+            stats.reset(self.base_directory)
+        summary = stats.summary(self.base_directory)
+        daemon_summary = self.daemonRequest('stats', {}, 5)
+        if daemon_summary:
+            summary += '\nCompletion daemon\n\n' + daemon_summary
+        self.multi_line_output(summary, 'SymfonyCommander Stats', True)
 
 
 class SymfonyCommanderSelectRouteCommand(SymfonyCommander, sublime_plugin.WindowCommand):
     def run(self, edit):
 
-        self.loadRoutes()
+        route_info = []
 
         def on_select_route(num):
             if num != -1:
-                route_name = SymfonyCommanderBase.route_info[num][0]
+                route_name = route_info[num][0]
                 self.injectText(edit, route_name)
 
-        self.view.window().show_quick_panel(SymfonyCommanderBase.route_info, on_select_route, sublime.MONOSPACE_FONT)
+        def show_routes(routes):
+            route_info.extend(routes.info())
+            self.view.window().show_quick_panel(route_info, on_select_route, sublime.MONOSPACE_FONT)
+
+        sublime.status_message('SymfonyCommander: loading routes ...')
+        self.lookupIndex('routes', show_routes)
 
 
 class SymfonyCommanderSelectContainerCommand(SymfonyCommander, sublime_plugin.WindowCommand):
-    def run(self, edit):
+    # by: None lists the services, 'class' lists them by class name and 'tag'
+    # asks for a tag first. Everything comes from the loaded index.
+    def run(self, edit, by=None):
 
-        self.loadContainer()
+        container_names = []
 
         def on_select_container(num):
             if num != -1:
-                container_name = SymfonyCommanderBase.container_info[num][0]
+                container_name = container_names[num]
                 self.injectText(edit, container_name)
 
-        self.view.window().show_quick_panel(SymfonyCommanderBase.container_info, on_select_container, sublime.MONOSPACE_FONT)
+        def show(items):
+            container_names.extend([name for name, row in items])
+            self.view.window().show_quick_panel([row for name, row in items], on_select_container, sublime.MONOSPACE_FONT)
+
+        def show_containers(containers):
+            services = list(zip(containers.names, containers.details or ()))
+            if by == 'class':
+                items = [(name, [service.class_name or '%s' % service, name]) for name, service in services]
+                items.sort(key=lambda item: item[1])
+                show(items)
+            elif by == 'tag':
+                tagged = {}
+                for name, service in services:
+                    for tag in service.tags:
+                        tagged.setdefault(tag, []).append((name, [name, '%s' % service]))
+                tags = sorted(tagged)
+
+                def on_select_tag(num):
+                    if num != -1:
+                        # a quick panel can not be opened from the callback of another
+                        sublime.set_timeout(lambda: show(tagged[tags[num]]), 10)
+
+                self.view.window().show_quick_panel([[tag, '%d services' % len(tagged[tag])] for tag in tags],
+                    on_select_tag, sublime.MONOSPACE_FONT)
+            else:
+                show([(name, [name, detail]) for name, detail in containers.info()])
+
+        sublime.status_message('SymfonyCommander: loading services ...')
+        self.lookupIndex('containers', show_containers)
 
 
 class SymfonyCommanderSwitchFileCommand(SymfonyCommander, sublime_plugin.TextCommand):
     def run(self, edit):
-        global jump_to_action
-        file = self.view.file_name()
-        file_match = re.search(r'(.+)[/\\](.+)Controller.php', file)
-        if file_match:
-            folder = file_match.group(1)
-            file = file_match.group(2)
-            action = self.get_current_function(self.view)
-            if action:
-                a = re.search('(\w+)Action', action).group(1)
-                self.view.window().open_file(folder + os.sep + '..' + os.sep + 'Resources' + os.sep + 'views' + os.sep + file + os.sep + a + '.html.twig')
-        elif re.search(r'(.+)[/\\](.+).html.twig', file):
-            file_match = re.search(r'(.+)[/\\](.+)[/\\](.+).html.twig', file)
-            folder = file_match.group(1)
-            controller = file_match.group(2)
-            action = file_match.group(3)
-            self.view.window().open_file(folder + os.sep + '..' + os.sep + '..' + os.sep + 'Controller' + os.sep + controller + 'Controller.php')
-            jump_to_action = action
+        self.loadSettings()
+        file_name = self.view.file_name()
+        if not self.base_directory or not file_name:
+            sublime.status_message('Cannot find the correct file, sorry!')
+            return
+        line = self.view.rowcol(self.view.sel()[0].begin())[0] + 1
+
+        def switch():
+            navigation = self.project().navigation
+            if controllerOf(self.base_directory, file_name):
+                targets = self.templatesOfAction(navigation, file_name, line)
+            else:
+                targets = self.actionsOfTemplate(navigation, file_name)
+            self.openTargets(targets)
+
+        self.loadNavigation(on_done=switch)
+
+    def templatesOfAction(self, navigation, file_name, line):
+        entry = navigation.actionAt(file_name, line)
+        if not entry:
+            return []
+        action_line, action, templates = entry
+        if not templates:
+            # no render call found, try the template named after the action
+            bundle_prefix, controller = controllerOf(self.base_directory, file_name)
+            templates = [bundle_prefix + ':' + controller + ':' + action + '.html.twig']
+        targets = []
+        for template in templates:
+            for path in navigation.templatePaths(template):
+                targets.append([template, path, 0])
+        return targets
+
+    def actionsOfTemplate(self, navigation, file_name):
+        section, names = classifyFile(self.base_directory, file_name)
+        if section != 'templates':
+            # app/Resources/views
+            views = (self.base_directory + "/app/Resources/views/").replace('\\', '/')
+            path = file_name.replace('\\', '/')
+            if not path.startswith(views):
+                return []
+            parts = path[len(views):].split('/')
+            names = [templateName('', parts)]
+        targets = []
+        for path, line, action in navigation.renders.get(names[0], []):
+            targets.append([action + 'Action', navigation.path(path), line])
+        if not targets:
+            # not rendered explicitly, try the action the template is named after
+            bundle_prefix, controller, template = names[0].split(':')
+            path = navigation.controllerPath(bundle_prefix, controller)
+            action = template.split('.')[0]
+            line = path and navigation.actionLine(path, action)
+            if line:
+                targets.append([action + 'Action', path, line])
+        return targets
+
+    def openTargets(self, targets):
+        def open_target(num):
+            if num != -1:
+                caption, path, line = targets[num]
+                if line:
+                    self.view.window().open_file(path + ':' + str(line), sublime.ENCODED_POSITION)
+                else:
+                    self.view.window().open_file(path)
+
+        if not targets:
+            sublime.status_message('Cannot find the correct file, sorry!')
+        elif len(targets) == 1:
+            open_target(0)
         else:
-            sublime.status_message('Cannot find the correct file, sorry!' + file)
-
-    def get_current_function(self, view):
-        sel = view.sel()[0]
-        functionRegs = view.find_by_selector('entity.name.function')
-        cf = None
-        for r in reversed(functionRegs):
-            if r.a < sel.a:
-                cf = view.substr(r)
-                break
-        return cf
+            self.view.window().show_quick_panel([[caption, path] for caption, path, line in targets], open_target)
 
     def is_enabled(self):
         filename = self.view.file_name()
-        if re.search(r'(.+)[/\\](.+)Controller.php', filename):
+        if not filename:
+            return False
+        if re.search(r'Controller\.php$', filename):
             return True
-        elif re.search(r'(.+)[/\\](.+).html.twig', filename):
+        elif re.search(r'[/\\]Resources[/\\]views[/\\].+\.(twig|php)$', filename):
             return True
         else:
             return False
 
 
+def pollWatchers():
+    # The watchers stat the files of the projects on a worker thread, the
+    # changed files are then handled on the UI thread
+    updater = SymfonyCommanderBase()
+    updater.view = None
+    updater.loadSettings()
+    if not updater.watch_interval:
+        SymfonyCommanderBase.watching = False
+        return
+    projects = list(SymfonyCommanderBase.projects.items())
+    changes = []
+
+    def work():
+        for base_directory, project in projects:
+            paths = project.watcher and project.watcher.poll()
+            if paths:
+                changes.append((base_directory, paths))
+
+    def on_done():
+        for base_directory, paths in changes:
+            if base_directory in SymfonyCommanderBase.projects:
+                updater.base_directory = base_directory
+                for path in paths:
+                    updater.updateFile(path)
+        sublime.set_timeout(pollWatchers, int(updater.watch_interval * 1000))
+
+    SymfonyCommanderBase.loader.start('watchers', work, on_done)
+
+
 class SymfonyEvent(sublime_plugin.EventListener, SymfonyCommanderBase):
-    def on_load(self, view):
-        global jump_to_action
-        if jump_to_action:
-            sel = view.find(jump_to_action + "Action", 0)
-            view.show(sel)
-            jump_to_action = ''
+    def on_post_save(self, view):
+        self.view = view
+        self.loadSettings()
+        file_name = view.file_name()
+        if self.base_directory and file_name:
+            watcher = self.project().watcher
+            if watcher:
+                watcher.mark(file_name)
+            self.updateFile(file_name)
+            self.daemonRequest('update', {'path': file_name}, 5, False)
 
 
 class SymfonyCommanderAutocomplete(sublime_plugin.EventListener, SymfonyCommanderBase):
 
+    sessions = {}
+
+    def on_close(self, view):
+        self.sessions.pop(view.id(), None)
+        if SymfonyCommanderBase.daemon:
+            # a daemon which is not running has no session to close
+            SymfonyCommanderBase.daemon.notify('close', {'session': self.sessionKey(view)}, 1, False)
+
+    def sessionKey(self, view):
+        # views of all editors share the daemon
+        return '%d:%d' % (os.getpid(), view.id())
+
+    def fieldContext(self, view, point):
+        # the code in front of the cursor, for the DQL aliases and findBy
+        # calls the entity fields are completed for
+        return view.substr(sublime.Region(max(0, point - 2000), point))
+
     def on_query_completions(self, view, prefix, locations):
+        started = time.time()
+        if len(locations) != 1:
+            return []
+
+        # the user only typed some more characters of the same word: the
+        # file, scope and string were checked by the call before
+        session = self.sessions.get(view.id())
+        point = locations[0]
+        if session and session.follows(prefix, point):
+            typed = prefix[len(session.prefix):]
+            if view.substr(sublime.Region(session.point, point)) == typed:
+                indexes = self.completionIndexes(session.base_directory, session.translation)
+                if len([index for index, with_search_prefix in indexes if not index.loaded]) == 0:
+                    return self.complete(session, indexes, point, prefix, (session.search_prefix or '') + typed, started,
+                        self.fieldContext(view, point), view.file_name())
+
+        self.sessions.pop(view.id(), None)
         self.view = view
         self.loadSettings()
         if not self.base_directory:
@@ -438,10 +671,6 @@ class SymfonyCommanderAutocomplete(sublime_plugin.EventListener, SymfonyCommande
         if syntax == None:
             return []
 
-        # only complete single line/selection
-        if len(locations) != 1:
-            return []
-
         # only if in a string contenxt
         scope = view.syntax_name(view.sel()[0].end())
 
@@ -463,53 +692,35 @@ class SymfonyCommanderAutocomplete(sublime_plugin.EventListener, SymfonyCommande
             search_prefix = match_prefix.group(1)
         else:
             search_prefix = False
+        context = self.fieldContext(view, point)
+        translation = isTranslationContext(context, view.substr(sublime.Region(point, point + 200)))
+        if self.completion_daemon:
+            snippets = self.daemonRequest('complete', {'session': self.sessionKey(view), 'point': point, 'prefix': prefix,
+                'search_prefix': search_prefix, 'context': context, 'file_name': view.file_name(), 'translation': translation},
+                self.daemon_timeout)
+            if snippets is not None:
+                stats.since(self.base_directory, 'completions (daemon)', started)
+                return [tuple(snippet) for snippet in snippets]
+            # only the indexes the editor has loaded anyway, e.g. for a
+            # quick panel: loading the others here would keep them twice
+            stats.count(self.base_directory, 'daemon fallback')
+            match_lists = []
+            for index, with_search_prefix in self.completionIndexes(self.base_directory, translation):
+                if index.loaded:
+                    match_lists.append(index.matches(prefix, with_search_prefix and search_prefix, limit=self.completion_limit))
+            return topMatches(match_lists, self.completion_limit)
+
         self.loadRoutes()
         self.loadContainer()
-        self.loadEntities()
-        self.loadTemplates()
-
-        snippets = []
-
-        for val in SymfonyCommanderBase.common_snippets[self.base_directory]:
-            if val.startswith(prefix):
-                snippets.append((val, val))
-
-        for val in SymfonyCommanderBase.routes[self.base_directory]:
-            new_snippet = self.checkPrefix(prefix, search_prefix, val, ' [Route]')
-            if new_snippet:
-                snippets.append(new_snippet)
-
-        for val in SymfonyCommanderBase.containers[self.base_directory]:
-            new_snippet = self.checkPrefix(prefix, search_prefix, val, ' [Service]')
-            if new_snippet:
-                snippets.append(new_snippet)
-
-        for val in SymfonyCommanderBase.entities[self.base_directory]:
-            new_snippet = self.checkPrefix(prefix, search_prefix, val, ' [Entity]')
-            if new_snippet:
-                snippets.append(new_snippet)
-
-        for val in SymfonyCommanderBase.templates[self.base_directory]:
-            new_snippet = self.checkPrefix(prefix, search_prefix, val, ' [Tpl]')
-            if new_snippet:
-                snippets.append(new_snippet)
-
-        return snippets
-
-    def checkPrefix(self, prefix, search_prefix, val, tipstring):
-        if search_prefix and search_prefix != prefix:
-            if val.startswith(search_prefix):
-                if not re.match(r".*[\.\:]$", search_prefix):
-                    replace_str = re.sub(r'((.*)[\:\.])(.(?![\:\.]))*$', r'\1', search_prefix)
-                    # insert_val = re.sub('[\:\.](.(?![\:\.]))*$', '', val)
-                    insert_val = val.replace(replace_str, '', 1)
-                else:
-                    insert_val = val.replace(search_prefix, '', 1)
-                return (val + tipstring, insert_val)
-        else:
-            if val.startswith(prefix):
-                return (val + tipstring, val)
-        return False
+        self.loadSources()
+        if translation:
+            self.loadTranslations()
+
+        session = CompletionSession(self.base_directory, self.completion_limit)
+        session.translation = translation
+        self.sessions[view.id()] = session
+        return self.complete(session, self.completionIndexes(self.base_directory, translation), point, prefix, search_prefix, started,
+            context, view.file_name())
 
 
 class SymfonyCommanderSearchSelectionCommand(sublime_plugin.TextCommand, SymfonyCommanderBase):
@@ -525,11 +736,9 @@ class SymfonyCommanderSearchSelectionCommand(sublime_plugin.TextCommand, Symfony
             text = self.view.substr(selection)
 
             if source == 'api':
-                url = self.getApiUrl(text)
+                self.searchApi(text)
             else:
-                url = self.getDocumentationUrl(text)
-
-            self.open_url(url)
+                self.open_url(self.getDocumentationUrl(text))
 
     def is_enabled(self):
         if len(self.view.sel()) > 1:
@@ -558,10 +767,9 @@ class SymfonyCommanderSearchInputCommand(sublime_plugin.WindowCommand, SymfonyCo
 
     def on_done(self, text):
         if self.source == 'api':
-            url = self.getApiUrl(text)
+            self.searchApi(text)
         else:
-            url = self.getDocumentationUrl(text)
-        self.open_url(url)
+            self.open_url(self.getDocumentationUrl(text))
 
     def on_change(self, input):
         pass
@@ -572,7 +780,11 @@ class SymfonyCommanderSearchInputCommand(sublime_plugin.WindowCommand, SymfonyCo
 
 class SymfonyCommanderRunTestCommand(sublime_plugin.TextCommand, SymfonyCommanderBase):
     def run(self, edit, path=''):
-        self.output(self.callPhpunit(' -c app ' + path))
+        self.loadSettings()
+        if self.phpunit_shards > 1 and not path:
+            self.runPhpunitSharded(self.base_directory + "/src")
+        else:
+            self.runPhpunit(' -c app ' + path)
 
     def is_enabled(self):
         self.loadSettings()
@@ -583,7 +795,7 @@ class SymfonyCommanderRunTestBundleCommand(sublime_plugin.TextCommand, SymfonyCo
     def run(self, edit, path=''):
         bundle_folder = self.getCurrentBundleFolder()
         if bundle_folder:
-            self.output(self.callPhpunit(' -c app ' + bundle_folder))
+            self.runPhpunitSharded(bundle_folder)
 
     def is_enabled(self):
         self.loadSettings()
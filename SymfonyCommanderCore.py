@@ -0,0 +1,3736 @@
+# MIT License**
+#
+# Copyright (c) 2012 Patrick Daether, public < at > pd-digital.de
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import os
+import os.path
+import sys
+import subprocess
+import re
+import fnmatch
+import bisect
+import threading
+import hashlib
+import binascii
+import json
+import time
+import signal
+import heapq
+from operator import itemgetter
+import tempfile
+import shutil
+import io
+import codecs
+import array
+import socket
+try:
+    from xml.etree.cElementTree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+from xml.etree import ElementTree
+try:
+    import Queue
+except ImportError:
+    import queue as Queue
+try:
+    import SocketServer
+except ImportError:
+    import socketserver as SocketServer
+
+# Bump this whenever the layout of the on disk cache changes
+CACHE_VERSION = 3
+
+
+def digest(text):
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return hashlib.md5(text).hexdigest()
+
+
+def mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0
+
+
+def subDirectories(path):
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return []
+    return [path + "/" + name for name in names if os.path.isdir(path + "/" + name)]
+
+
+def bundleDirectories(base_directory):
+    bundle_dirs = []
+    for company_dir in subDirectories(base_directory + "/src"):
+        bundle_dirs.extend(subDirectories(company_dir))
+    return bundle_dirs
+
+
+def fingerprint(base_directory, section, vendors=False):
+    # Cheap fingerprint of everything a section of the index is built from.
+    # Only directory listings and stat calls are used, no file is read.
+    # vendors: entities and templates include the bundles of vendor/.
+    if section in ('routes', 'containers'):
+        config_dir = base_directory + "/app/config"
+        try:
+            paths = [config_dir + "/" + name for name in os.listdir(config_dir)]
+        except OSError:
+            paths = []
+        paths.append(config_dir)
+        paths.extend(subDirectories(base_directory + "/app/cache"))
+        if section == 'routes':
+            paths.extend(controllerFiles(base_directory))
+    elif section == 'api':
+        api_dir = base_directory + "/vendor/symfony"
+        paths = [api_dir, base_directory + "/vendor/composer/installed.json"] + subDirectories(api_dir)
+    else:
+        src_dir = base_directory + "/src"
+        bundle_dirs = bundleDirectories(base_directory)
+        paths = [src_dir] + subDirectories(src_dir) + bundle_dirs
+        for bundle_dir in bundle_dirs:
+            if section == 'entities':
+                paths.append(bundle_dir + "/Entity")
+            else:
+                for dir_name, dir_names, file_names in os.walk(bundle_dir + "/Resources/views"):
+                    paths.append(dir_name)
+        if vendors:
+            paths.extend(['vendors', base_directory + "/vendor", base_directory + "/vendor/composer/installed.json"])
+    return digest('\n'.join(['%s %r' % (path, mtime(path)) for path in paths]))
+
+
+def scanDirectory(path):
+    # (name, is_dir) for every entry of a directory. os.scandir gives the
+    # type of an entry for free, older Pythons need a stat call per entry.
+    scandir = getattr(os, 'scandir', None)
+    try:
+        if scandir:
+            return [(entry.name, entry.is_dir()) for entry in scandir(path)]
+        return [(name, os.path.isdir(path + "/" + name)) for name in os.listdir(path)]
+    except OSError:
+        return []
+
+
+def parallelMap(function, items, workers=4):
+    # Calls function(*item) for every item on a small pool of threads and
+    # returns the results in the order of the items
+    results = [None] * len(items)
+    todo = Queue.Queue()
+    for i, item in enumerate(items):
+        todo.put((i, item))
+
+    def work():
+        while True:
+            try:
+                i, item = todo.get_nowait()
+            except Queue.Empty:
+                return
+            results[i] = function(*item)
+
+    threads = [threading.Thread(target=work) for n in range(min(max(workers, 1), len(items)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def projectPath(base_directory, path):
+    # path relative to the project with '/' as separator, None for a file
+    # outside of the project
+    base = base_directory.replace('\\', '/').rstrip('/') + '/'
+    path = path.replace('\\', '/')
+    if not path.startswith(base):
+        return None
+    return path[len(base):]
+
+
+def fileStates(base_directory, paths):
+    # [mtime, size] of every file of paths by its path in the project
+    states = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        states[projectPath(base_directory, path)] = [stat.st_mtime, stat.st_size]
+    return states
+
+
+def filesCurrent(files, states):
+    # True if the cached [mtime, size, ...] entries of files are the ones
+    # of the files on disk
+    if len(files) != len(states):
+        return False
+    for path, state in states.items():
+        entry = files.get(path)
+        if not entry or entry[0] != state[0] or entry[1] != state[1]:
+            return False
+    return True
+
+
+def rescanFiles(base_directory, paths, cached, parse, workers=4):
+    # Entries of the files of paths, parse(path) returns [mtime, size, ...]
+    # of a file. Only files which are new or changed since they were cached
+    # are parsed. Returns the entries by path in the project and how many
+    # files were parsed.
+    files = {}
+    todo = []
+    for path, state in fileStates(base_directory, paths).items():
+        entry = cached.get(path)
+        if entry and entry[0] == state[0] and entry[1] == state[1]:
+            files[path] = entry
+        else:
+            todo.append(path)
+    for path, entry in zip(todo, parallelMap(parse, [(base_directory + "/" + path,) for path in todo], workers)):
+        if entry:
+            files[path] = entry
+    return files, len(todo)
+
+
+def scanBundle(bundle_dir, bundle_prefix):
+    entities = []
+    for name, is_dir in scanDirectory(bundle_dir + "/Entity"):
+        if isEntityFile(name):
+            entities.append(name[:-4])
+            entities.append(bundle_prefix + ':' + name[:-4])
+    templates = []
+    todo = [(bundle_dir + "/Resources/views", [])]
+    while todo:
+        dir_name, parts = todo.pop()
+        for name, is_dir in scanDirectory(dir_name):
+            if name.endswith('.twig') or name.endswith('.php'):
+                templates.append(templateName(bundle_prefix, parts + [name]))
+            if is_dir:
+                todo.append((dir_name + "/" + name, parts + [name]))
+    return entities, templates
+
+
+def scanSources(base_directory, workers=4):
+    # Visits every bundle below src/ once and collects the entities, the
+    # templates and the bundle prefixes (e.g. AcmeDemoBundle) in one pass
+    src_dir = base_directory + "/src"
+    bundles = []
+    for company, is_dir in scanDirectory(src_dir):
+        if is_dir:
+            for bundle, is_dir in scanDirectory(src_dir + "/" + company):
+                if is_dir:
+                    bundles.append((src_dir + "/" + company + "/" + bundle, company + bundle))
+    entities = []
+    templates = []
+    for result in parallelMap(scanBundle, bundles, workers):
+        if result:
+            entities.extend(result[0])
+            templates.extend(result[1])
+    return entities, templates, [bundle[1] for bundle in bundles]
+
+
+def installedPackages(base_directory):
+    # (name, directory, fingerprint) of every package Composer installed to
+    # vendor/, the fingerprint changes with the version and the commit of a
+    # package. Without vendor/composer/installed.json every vendor/<a>/<b>
+    # directory is taken as a package and its modification time is used.
+    vendor_dir = base_directory + "/vendor"
+    try:
+        f = open(vendor_dir + "/composer/installed.json")
+        try:
+            installed = json.load(f)
+        finally:
+            f.close()
+    except (IOError, ValueError):
+        installed = None
+    if isinstance(installed, dict):
+        # Composer 2
+        installed = installed.get('packages')
+    packages = []
+    if not isinstance(installed, list):
+        for owner_dir in subDirectories(vendor_dir):
+            if owner_dir.rsplit('/', 1)[-1] not in ('bin', 'composer'):
+                for package_dir in subDirectories(owner_dir):
+                    packages.append((package_dir[len(vendor_dir) + 1:], package_dir, '%r' % mtime(package_dir)))
+        return packages
+    for package in installed:
+        name = package.get('name')
+        if not name:
+            continue
+        package_dir = vendor_dir + "/" + name
+        if package.get('install-path'):
+            package_dir = os.path.normpath(vendor_dir + "/composer/" + package['install-path']).replace('\\', '/')
+        version = [package.get('version'), package.get('version_normalized')]
+        for source in ('source', 'dist'):
+            version.append((package.get(source) or {}).get('reference'))
+        packages.append((name, package_dir, digest(json.dumps(version))))
+    return packages
+
+
+def isBundleMarker(file_name, dir_name, entries):
+    # FOSUserBundle.php is the bundle class if it sits in UserBundle/ or
+    # next to the usual bundle directories
+    if not file_name.endswith('Bundle.php') or file_name == 'Bundle.php':
+        return False
+    if file_name[:-4].endswith(dir_name.rsplit('/', 1)[-1]):
+        return True
+    return len([name for name, is_dir in entries if is_dir and name in ('Resources', 'DependencyInjection', 'Controller', 'Entity')]) > 0
+
+
+def scanPackage(vendor_dir, package_dir, ignore, max_depth, deadline):
+    # Finds the bundles of a package by their bundle class and scans them
+    # like the bundles of src/. Directories matching one of the ignore globs
+    # (relative to vendor/) or deeper than max_depth are skipped. Returns the
+    # entities, templates, bundle prefixes and whether the package was
+    # scanned before the deadline.
+    entities = []
+    templates = []
+    bundles = []
+    todo = [(package_dir, 0)]
+    while todo:
+        if time.time() > deadline:
+            return entities, templates, bundles, False
+        dir_name, depth = todo.pop()
+        entries = scanDirectory(dir_name)
+        markers = [name[:-4] for name, is_dir in entries if not is_dir and isBundleMarker(name, dir_name, entries)]
+        if markers:
+            bundle_entities, bundle_templates = scanBundle(dir_name, markers[0])
+            entities.extend(bundle_entities)
+            templates.extend(bundle_templates)
+            bundles.append(markers[0])
+            continue
+        if depth >= max_depth:
+            continue
+        for name, is_dir in entries:
+            path = dir_name + "/" + name
+            if is_dir and not [glob for glob in ignore if fnmatch.fnmatchcase(path[len(vendor_dir) + 1:], glob)]:
+                todo.append((path, depth + 1))
+    return entities, templates, bundles, True
+
+
+def scanVendors(base_directory, cached, ignore, max_depth, seconds, workers=4):
+    # Entities, templates and bundle prefixes of the bundles in vendor/.
+    # cached maps package names to [fingerprint, entities, templates,
+    # bundles] of an earlier scan, only packages whose fingerprint changed
+    # are scanned again. Returns the entries, the new cache and the number
+    # of scanned packages. Packages the time budget of seconds was not
+    # enough for are used as far as they got, but are not cached.
+    vendor_dir = base_directory + "/vendor"
+    deadline = time.time() + seconds
+    packages = installedPackages(base_directory)
+    todo = [package for package in packages if (cached.get(package[0]) or [None])[0] != package[2]]
+    results = parallelMap(lambda name, package_dir, package_fingerprint: scanPackage(vendor_dir, package_dir, ignore, max_depth, deadline),
+        todo, workers)
+    scanned = dict(zip([package[0] for package in todo], results))
+    entities = []
+    templates = []
+    bundles = []
+    packages_cache = {}
+    for name, package_dir, package_fingerprint in packages:
+        if name in scanned:
+            package_entities, package_templates, package_bundles, complete = scanned[name]
+            if complete:
+                packages_cache[name] = [package_fingerprint, package_entities, package_templates, package_bundles]
+        else:
+            packages_cache[name] = cached[name]
+            package_entities, package_templates, package_bundles = cached[name][1:]
+        entities.extend(package_entities)
+        templates.extend(package_templates)
+        bundles.extend(package_bundles)
+    return entities, templates, bundles, packages_cache, len(todo)
+
+
+def isEntityFile(file_name):
+    return re.search(r'^((.)(?!Repository))*\.php$', file_name) is not None
+
+
+def templateName(bundle_prefix, parts):
+    # Template name of a file below Resources/views, parts is the path
+    # relative to the views directory, e.g. ['Welcome', 'index.html.twig']
+    return bundle_prefix + ':' + '/'.join(parts[:-1]) + ':' + parts[-1]
+
+
+def classifyFile(base_directory, path):
+    # Finds out which part of the index a file of the project belongs to.
+    # Returns the section and, for entities and templates, the entries of
+    # that file, for message catalogs its path in the project. 'sources'
+    # means the bundle structure itself has changed.
+    relative_path = projectPath(base_directory, path)
+    if relative_path is None:
+        return None, []
+    parts = relative_path.split('/')
+    if len(parts) == 3 and parts[0] == 'app' and parts[1] == 'config':
+        if parts[2].startswith('routing'):
+            return 'routes', []
+        return 'containers', []
+    if parts[:3] == ['app', 'Resources', 'translations'] and len(parts) == 4:
+        if TRANSLATION_FILE.match(parts[3]):
+            return 'translations', [relative_path]
+        return None, []
+    if parts[0] != 'src' or len(parts) < 2:
+        return None, []
+    if len(parts) <= 3:
+        return 'sources', []
+    bundle_prefix = parts[1] + parts[2]
+    rest = parts[3:]
+    if len(rest) == 2 and rest[0] == 'Entity' and isEntityFile(rest[1]):
+        entity_name = rest[1][:-4]
+        return 'entities', [entity_name, bundle_prefix + ':' + entity_name]
+    if len(rest) > 2 and rest[0] == 'Resources' and rest[1] == 'views' and re.search(r'\.(twig|php)$', rest[-1]):
+        return 'templates', [templateName(bundle_prefix, rest[2:])]
+    if len(rest) == 3 and rest[0] == 'Resources' and rest[1] == 'translations' and TRANSLATION_FILE.match(rest[2]):
+        return 'translations', [relative_path]
+    if len(rest) == 3 and rest[0] == 'Resources' and rest[1] == 'config':
+        if rest[2].startswith('routing'):
+            return 'routes', []
+        return 'containers', []
+    if rest[0] == 'Controller':
+        return 'routes', []
+    if rest[0] == 'DependencyInjection':
+        return 'containers', []
+    return None, []
+
+
+def listNames(path):
+    try:
+        return set(os.listdir(path))
+    except OSError:
+        return set()
+
+
+class DirectoryResolver(object):
+    # Walks up from a directory to the first directory for which check()
+    # returns True and caches the result for every directory on the way,
+    # negative results included. Within ttl seconds a lookup is a single
+    # dict access, after that a found directory is revalidated with check()
+    # alone and only missing or stale results walk the tree again.
+
+    def __init__(self, check, ttl=5):
+        self.check = check
+        self.ttl = ttl
+        self.cache = {}
+        self.walks = 0
+
+    def resolve(self, dir_name):
+        now = time.time()
+        entry = self.cache.get(dir_name)
+        if entry:
+            if now - entry[1] < self.ttl:
+                return entry[0]
+            if entry[0] and self.check(entry[0]):
+                self.cache[dir_name] = (entry[0], now)
+                return entry[0]
+        self.walks += 1
+        visited = []
+        found = False
+        while True:
+            visited.append(dir_name)
+            if self.check(dir_name):
+                found = dir_name
+                break
+            parent = os.path.dirname(dir_name)
+            if parent == dir_name:
+                break
+            dir_name = parent
+        for visited_dir in visited:
+            self.cache[visited_dir] = (found, now)
+        return found
+
+
+def isProjectRoot(dir_name):
+    return os.path.isfile(dir_name + "/app/console")
+
+
+def containsBundle(dir_name):
+    for file in listNames(dir_name):
+        if file.endswith('Bundle') and os.path.isdir(dir_name + "/" + file):
+            return True
+    return False
+
+
+class ProjectWatcher(object):
+    # Polls the mtimes of the configuration files, the message catalogs, the
+    # entities and the bundle and template directories of a project. poll()
+    # returns the paths of all files that were changed, created or deleted
+    # since the last call. poll() may run on a worker thread while mark() is
+    # called for a saved file: the files are stat'ed without the lock, which
+    # is only held to take the result over, and files marked in the
+    # meantime are marked again in it.
+
+    def __init__(self, base_directory):
+        self.base_directory = base_directory
+        self.files = None
+        self.dirs = None
+        self.marked = set()
+        self.lock = threading.Lock()
+
+    def snapshot(self):
+        self.begin()
+        dirs, files = self.takeSnapshot()
+        self.update(dirs, files)
+
+    def takeSnapshot(self):
+        base_directory = self.base_directory
+        config_dirs = [base_directory + "/app/config", base_directory + "/app/Resources/translations"]
+        dirs = [base_directory + "/src"] + subDirectories(base_directory + "/src")
+        for bundle_dir in bundleDirectories(base_directory):
+            dirs.append(bundle_dir)
+            config_dirs.append(bundle_dir + "/Entity")
+            config_dirs.append(bundle_dir + "/Resources/config")
+            config_dirs.append(bundle_dir + "/Resources/translations")
+            for dir_name, dir_names, file_names in os.walk(bundle_dir + "/Resources/views"):
+                dirs.append(dir_name)
+        dir_states = {}
+        files = {}
+        for path in dirs + config_dirs:
+            dir_states[path] = (mtime(path), listNames(path))
+        for config_dir in config_dirs:
+            for name in dir_states[config_dir][1]:
+                files[config_dir + "/" + name] = mtime(config_dir + "/" + name)
+        return dir_states, files
+
+    def begin(self):
+        # A copy of the last state, marks from now on are applied to the
+        # state update() takes over
+        self.lock.acquire()
+        try:
+            self.marked = set()
+            if self.dirs is None:
+                return None, None
+            return dict(self.dirs), dict(self.files)
+        finally:
+            self.lock.release()
+
+    def update(self, dirs, files):
+        self.lock.acquire()
+        try:
+            self.dirs = dirs
+            self.files = files
+            for path in self.marked:
+                self.markPath(path)
+            self.marked = set()
+        finally:
+            self.lock.release()
+
+    def poll(self):
+        dirs, files = self.begin()
+        if dirs is None:
+            self.snapshot()
+            return []
+        changed = []
+        for path, (old_mtime, old_names) in list(dirs.items()):
+            new_mtime = mtime(path)
+            if new_mtime == old_mtime:
+                continue
+            new_names = listNames(path)
+            for name in new_names.symmetric_difference(old_names):
+                changed.extend(self.filesBelow(dirs, path + "/" + name))
+            dirs[path] = (new_mtime, new_names)
+        for path, old_mtime in list(files.items()):
+            if mtime(path) != old_mtime and path not in changed:
+                changed.append(path)
+        if changed:
+            dirs, files = self.takeSnapshot()
+        self.update(dirs, files)
+        return changed
+
+    def filesBelow(self, dirs, path):
+        # A created or deleted entry, for directories all files in it are
+        # reported as well (as far as they are known)
+        files = [path]
+        for dir_name, dir_names, file_names in os.walk(path):
+            files.extend([dir_name + "/" + name for name in file_names])
+        for dir_name, (dir_mtime, names) in dirs.items():
+            if dir_name.startswith(path + "/") or dir_name == path:
+                files.extend([dir_name + "/" + name for name in names])
+        return files
+
+    def mark(self, path):
+        # Remember the current state of a file which was handled already
+        # (e.g. on save), so the next poll does not report it again
+        self.lock.acquire()
+        try:
+            self.marked.add(path)
+            if self.files is not None:
+                self.markPath(path)
+        finally:
+            self.lock.release()
+
+    def markPath(self, path):
+        if path in self.files:
+            self.files[path] = mtime(path)
+        dir_name = os.path.dirname(path)
+        if dir_name in self.dirs:
+            self.dirs[dir_name] = (mtime(dir_name), listNames(dir_name))
+
+
+class DiskCache(object):
+    # Versioned on disk copy of the indexes of one project: a directory with
+    # one JSON file per section. Every section is stored together with the
+    # fingerprint it was built from and is only used again while that
+    # fingerprint still matches. put() hands the section to a writer thread,
+    # so saving a large index does not hold up the caller; the data must not
+    # be changed afterwards. A fingerprint which is slow to compute can be
+    # given as a function, the writer thread calls it. get() already sees
+    # sections which are still waiting to be written.
+
+    def __init__(self, path):
+        self.path = path
+        self.pending = {}
+        self.writer = None
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def sectionPath(self, section):
+        return os.path.join(self.path, section + '.json')
+
+    def get(self, section, fingerprint):
+        self.lock.acquire()
+        try:
+            entry = self.pending.get(section)
+        finally:
+            self.lock.release()
+        if entry is None:
+            entry = self.read(section)
+        elif callable(entry['fingerprint']):
+            entry = dict(entry, fingerprint=entry['fingerprint']())
+        if entry and entry.get('fingerprint') == fingerprint:
+            return entry.get('data')
+
+    def read(self, section):
+        try:
+            f = open(self.sectionPath(section))
+            try:
+                entry = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return None
+        if isinstance(entry, dict) and entry.get('version') == CACHE_VERSION:
+            return entry
+
+    def put(self, section, fingerprint, data):
+        self.lock.acquire()
+        try:
+            self.pending[section] = {'version': CACHE_VERSION, 'fingerprint': fingerprint, 'data': data}
+            if not self.writer:
+                # started first, flush() may join it right away
+                writer = threading.Thread(target=self.write)
+                writer.setDaemon(True)
+                writer.start()
+                self.writer = writer
+        finally:
+            self.lock.release()
+
+    def write(self):
+        # Saves the pending sections until there are no more, a section put
+        # again in the meantime is written once more
+        while True:
+            self.lock.acquire()
+            try:
+                if not self.pending:
+                    self.writer = None
+                    return
+                section = list(self.pending)[0]
+                entry = self.pending[section]
+            finally:
+                self.lock.release()
+            self.write_lock.acquire()
+            try:
+                if callable(entry['fingerprint']):
+                    self.save(section, dict(entry, fingerprint=entry['fingerprint']()))
+                else:
+                    self.save(section, entry)
+            finally:
+                self.write_lock.release()
+            self.lock.acquire()
+            try:
+                if self.pending.get(section) is entry:
+                    del self.pending[section]
+            finally:
+                self.lock.release()
+
+    def flush(self):
+        # waits until the pending sections are written
+        writer = self.writer
+        while writer:
+            writer.join()
+            writer = self.writer
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.pending = {}
+        finally:
+            self.lock.release()
+        self.write_lock.acquire()
+        try:
+            for name in listNames(self.path):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+        finally:
+            self.write_lock.release()
+
+    def save(self, section, entry):
+        path = self.sectionPath(section)
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            tmp_path = path + '.tmp'
+            f = open(tmp_path, 'w')
+            try:
+                json.dump(entry, f)
+            finally:
+                f.close()
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            pass
+
+
+def segmentCut(search_prefix):
+    # Number of characters of an entry which are already typed in front of
+    # the current word (everything up to the last ':' or '.')
+    cut = max(search_prefix.rfind(':'), search_prefix.rfind('.'))
+    if cut == -1:
+        return len(search_prefix)
+    return cut + 1
+
+
+BOUNDARY_CHARS = '.:_/'
+
+
+shared_bounds = {}
+
+
+def boundaries(name):
+    # Positions in name where a new segment starts: the first character,
+    # everything after one of BOUNDARY_CHARS and upper case letters. Most
+    # names share their boundaries with others, so equal tuples are only
+    # kept once.
+    bounds = [0]
+    for i in range(1, len(name)):
+        if name[i - 1] in BOUNDARY_CHARS or (name[i].isupper() and not name[i - 1].isupper()):
+            bounds.append(i)
+    bounds = tuple(bounds)
+    return shared_bounds.setdefault(bounds, bounds)
+
+
+try:
+    intern
+except NameError:
+    from sys import intern
+
+
+def internName(name):
+    # Equal names of all projects and indexes share one string. Python 2 can
+    # only intern byte strings, other names are kept as they are.
+    try:
+        return intern(str(name))
+    except (TypeError, UnicodeError):
+        return name
+
+
+def fitsBehind(name, query, last):
+    # True if query is a subsequence of name[last + 1:]
+    for char in query:
+        last = name.find(char, last + 1)
+        if last == -1:
+            return False
+    return True
+
+
+def fuzzyMatch(name, bounds, query, score=0, last=-1):
+    # Scores query as a subsequence of name[last + 1:] (name and query lower
+    # case). Characters on a segment boundary or right behind the previous
+    # hit count most, skipped characters cost a little. Returns the score,
+    # the position of the last hit, from which a match of a longer query
+    # can be continued, and whether it jumped over an earlier occurrence of
+    # a character, or None if the characters of query do not all appear in
+    # order. A longer query gets the same hits for its beginning as long as
+    # its rest fits behind them, so continuing a match gives the same score
+    # as matching the longer query at once.
+    jumped = False
+    for k, char in enumerate(query):
+        found = name.find(char, last + 1)
+        if found == -1:
+            return None
+        i = bisect.bisect_left(bounds, found)
+        on_bound = i < len(bounds) and bounds[i] == found
+        if found != last + 1 and not on_bound:
+            # jump to a later occurrence on a boundary if the rest of the
+            # query still fits behind it
+            for bound in bounds[i:]:
+                if name[bound] == char:
+                    if fitsBehind(name, query[k + 1:], bound):
+                        found = bound
+                        on_bound = True
+                        jumped = True
+                    break
+        if found == last + 1:
+            score += 6
+        elif on_bound:
+            score += 8
+        else:
+            score += 1
+        skipped = found - last - 1
+        if skipped:
+            score -= skipped < 5 and skipped * 0.5 or 2.5
+        last = found
+    return score, last, jumped
+
+
+def topMatches(match_lists, limit):
+    # (trigger, text) of the best limit (score, trigger, text) entries of
+    # all lists, with equal scores in the order of the lists, 0 keeps all
+    # of them
+    matches = []
+    for match_list in match_lists:
+        matches.extend(match_list)
+    if limit and len(matches) > limit:
+        matches = heapq.nlargest(limit, matches, key=lambda match: match[0])
+    else:
+        matches.sort(key=lambda match: -match[0])
+    return [(trigger, text) for score, trigger, text in matches]
+
+
+def runCommand(command, cwd):
+    # stdout, stderr and the exit status of a shell command
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, cwd=cwd)
+    result, errors = process.communicate()
+    if not isinstance(result, str):
+        # Python 3, e.g. in the completion daemon
+        result = result.decode('utf-8', 'replace')
+        errors = errors.decode('utf-8', 'replace')
+    return result, errors, process.returncode
+
+
+def commandError(output, errors, status):
+    # None if a command worked, else why it did not: the end of its error
+    # output, or of its output if it had none, or its exit status
+    if status == 0 and output.strip():
+        return None
+    message = errors.strip() or (status and output.strip()) or (status and 'exit status %d' % status) or 'no output'
+    return message[-500:]
+
+
+def parseDebugOutput(output, header):
+    # Splits the output of router:debug / container:debug into the names
+    # and the [name, info] pairs shown in the quick panels
+    names = []
+    info = []
+    for val in output.splitlines():
+        if val.strip() and not val.startswith('Name') and not val.startswith(header):
+            parts = val.split(None, 1)
+            info.append([parts[0], ' '.join(parts[1:])])
+            names.append(parts[0])
+    return names, info
+
+
+def compiledFile(base_directory, env, suffix, sources=()):
+    # A file Symfony compiled into app/cache/<env>, e.g. the url generator
+    # or the container dump. Returns None if there is none or if it is
+    # older than one of the configuration files or of the other sources
+    # it is built from.
+    cache_dir = base_directory + "/app/cache/" + env
+    path = None
+    for name in listNames(cache_dir):
+        if name.endswith(suffix):
+            path = cache_dir + "/" + name
+            break
+    if not path:
+        return None
+    built = mtime(path)
+    for config_file in configFiles(base_directory) + list(sources):
+        if mtime(config_file) > built:
+            return None
+    return path
+
+
+def controllerFiles(base_directory):
+    # The controllers of the bundles, their annotations may define routes
+    files = []
+    todo = [bundle_dir + "/Controller" for bundle_dir in bundleDirectories(base_directory)]
+    while todo:
+        dir_name = todo.pop()
+        for name, is_dir in scanDirectory(dir_name):
+            if is_dir:
+                todo.append(dir_name + "/" + name)
+            elif name.endswith('.php'):
+                files.append(dir_name + "/" + name)
+    return files
+
+
+def configFiles(base_directory):
+    config_dirs = [base_directory + "/app/config"]
+    config_dirs.extend([bundle_dir + "/Resources/config" for bundle_dir in bundleDirectories(base_directory)])
+    files = []
+    for config_dir in config_dirs:
+        files.extend([config_dir + "/" + name for name in listNames(config_dir)])
+    return files
+
+
+def configFingerprint(base_directory):
+    return digest('\n'.join(['%s %r' % (path, mtime(path)) for path in configFiles(base_directory)]))
+
+
+WORKER_DONE = '@@SYMFONY_COMMANDER_DONE@@'
+CONSOLE_RETRY_SECONDS = 30
+ENV_OPTION = r'(?:--env[= ]|-e[= ]?)(\w+)'
+
+
+def workerCanRun(command, env):
+    # The worker keeps one booted kernel, so commands which rebuild the
+    # cache, need another environment or never finish are run on their own
+    if command.startswith('cache:') or '--watch' in command:
+        return False
+    envs = re.findall(ENV_OPTION, command)
+    return not envs or envs == [env]
+
+
+def conflictKey(command):
+    # Commands with the same key are never run at the same time, e.g. two
+    # cache:* commands for the same environment
+    name = command.split(' ', 1)[0]
+    if name.startswith('cache:'):
+        envs = re.findall(ENV_OPTION, command)
+        return 'cache:' + (envs and envs[-1] or 'dev')
+    if name.startswith('assets:') or name.startswith('assetic:'):
+        return 'assets'
+    return name
+
+
+class ConsoleWorker(object):
+    # A long running console process which boots the Symfony kernel once
+    # and then runs one command after another (see console-worker.php).
+    # Commands are written to its stdin line by line, the output of every
+    # command ends with a WORKER_DONE line. Any program speaking the same
+    # protocol can be used, e.g. benchmark/fake_worker.py.
+    # The process is restarted if it died or the configuration changed, and
+    # killed if a command prints nothing for timeout seconds.
+
+    def __init__(self, command, cwd, timeout=0):
+        self.command = command
+        self.cwd = cwd
+        self.timeout = timeout
+        self.process = None
+        self.config = None
+        self.last_read = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.config = configFingerprint(self.cwd)
+        options = {}
+        if os.name == 'posix':
+            options['preexec_fn'] = os.setsid
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            shell=True, cwd=self.cwd, universal_newlines=True, **options)
+
+    def stop(self):
+        # May be called from another thread while run() waits for output,
+        # which then returns None
+        process = self.process
+        self.process = None
+        if process and process.poll() is None:
+            killProcess(process)
+            try:
+                process.stdin.close()
+            except (IOError, OSError):
+                pass
+            process.wait()
+
+    def isRunning(self):
+        return self.process is not None and self.process.poll() is None
+
+    def run(self, command):
+        # Returns the output of the command or None if the worker failed
+        result = self.execute(command)
+        return result and result[0]
+
+    def execute(self, command):
+        # Returns the output and the exit status of the command or None if
+        # the worker failed
+        self.lock.acquire()
+        try:
+            if not self.isRunning() or self.config != configFingerprint(self.cwd):
+                self.stop()
+                self.start()
+            process = self.process
+            done = threading.Event()
+            self.last_read = time.time()
+            if self.timeout:
+                watchdog = threading.Thread(target=self.watch, args=(process, done))
+                watchdog.setDaemon(True)
+                watchdog.start()
+            try:
+                process.stdin.write(command + '\n')
+                process.stdin.flush()
+                lines = []
+                while True:
+                    line = process.stdout.readline()
+                    if not line:
+                        # the worker died or was stopped
+                        self.stop()
+                        return None
+                    self.last_read = time.time()
+                    if line.startswith(WORKER_DONE):
+                        try:
+                            status = int(line[len(WORKER_DONE):])
+                        except ValueError:
+                            status = 0
+                        break
+                    lines.append(line)
+            except (IOError, OSError, ValueError):
+                self.stop()
+                return None
+            finally:
+                done.set()
+            if lines and lines[-1] == '\n':
+                lines.pop()
+            return ''.join(lines), status
+        finally:
+            self.lock.release()
+
+    def watch(self, process, done):
+        # Stops the worker once the running command was silent for too long,
+        # readline() in run() then returns
+        while not done.is_set():
+            idle = time.time() - self.last_read
+            if idle >= self.timeout:
+                if self.process is process:
+                    self.stop()
+                return
+            done.wait(self.timeout - idle)
+
+
+PHP_STRING = r"'((?:[^'\\]|\\.)*)'"
+ROUTE_LINE = re.compile(r"^\s*" + PHP_STRING + r" => (.*)$")
+ROUTE_TOKENS = re.compile(r"\),\s*3 =>\s*array \(")
+ROUTE_HOST_TOKENS = re.compile(r"\),\s*4 =>\s*array \(")
+ROUTE_TOKEN = re.compile(r"0 => '(text|variable)',\s*1 => " + PHP_STRING + r",(?:\s*2 => " + PHP_STRING + r",\s*3 => " + PHP_STRING + r",)?")
+ROUTE_METHOD = re.compile(r"'_method' => " + PHP_STRING)
+
+
+def phpUnescape(text):
+    return text.replace("\\'", "'").replace("\\\\", "\\")
+
+
+CONTROLLER_FUNCTION = re.compile(r'^\s*(?:(?:public|protected|private|static|final|abstract)\s+)*function\s+&?\s*(\w+)\s*\(')
+CONTROLLER_TEMPLATE = re.compile(r'@Template\b(?:\(\s*(?:template\s*=\s*)?"([^"]+)")?')
+CONTROLLER_RENDER = re.compile(r'\b(?:render|renderView|stream)\s*\(\s*[\'"]([^\'"]+\.(?:twig|php))[\'"]')
+
+
+def controllerOf(base_directory, path):
+    # (bundle prefix, controller) of a controller file below src/, e.g.
+    # ('AcmeBlogBundle', 'Admin/Post') for .../Controller/Admin/PostController.php
+    base = base_directory.replace('\\', '/').rstrip('/') + '/src/'
+    path = path.replace('\\', '/')
+    if not path.startswith(base) or not path.endswith('Controller.php'):
+        return None
+    parts = path[len(base):].split('/')
+    if len(parts) < 4 or parts[2] != 'Controller':
+        return None
+    return parts[0] + parts[1], '/'.join(parts[3:])[:-len('Controller.php')]
+
+
+def normalizeTemplate(name):
+    # The bundle notation (AcmeBlogBundle:Post:show.html.twig) of the
+    # namespaced (@AcmeBlog/Post/show.html.twig) and the plain
+    # (post/show.html.twig in app/Resources/views) names of a template
+    if ':' in name:
+        return name
+    if name.startswith('@'):
+        parts = name[1:].split('/')
+        return parts[0] + 'Bundle:' + '/'.join(parts[1:-1]) + ':' + parts[-1]
+    parts = name.split('/')
+    return ':' + '/'.join(parts[:-1]) + ':' + parts[-1]
+
+
+def parseController(path, bundle_prefix, controller):
+    # (line, action, templates) of every action of a controller file, the
+    # templates are the ones named in render calls and @Template annotations
+    actions = []
+    template = None
+    # templates of the action being read, None inside any other method
+    current = None
+    try:
+        f = open(path)
+        try:
+            lines = f.readlines()
+        finally:
+            f.close()
+    except IOError:
+        return actions
+    for number, line in enumerate(lines):
+        match = CONTROLLER_TEMPLATE.search(line)
+        if match and '*' in line:
+            template = match.group(1) or True
+            continue
+        match = CONTROLLER_FUNCTION.match(line)
+        if match:
+            if not match.group(1).endswith('Action') or match.group(1) == 'Action':
+                current = None
+                template = None
+                continue
+            action = match.group(1)[:-len('Action')]
+            templates = []
+            if template is True:
+                templates.append(bundle_prefix + ':' + controller + ':' + action + '.html.twig')
+            elif template:
+                templates.append(normalizeTemplate(template))
+            actions.append((number + 1, action, templates))
+            current = templates
+            template = None
+            continue
+        if current is not None:
+            for match in CONTROLLER_RENDER.finditer(line):
+                name = normalizeTemplate(match.group(1))
+                if name not in current:
+                    current.append(name)
+    return actions
+
+
+def scanControllers(bundle_dir, bundle_prefix):
+    controllers = []
+    todo = [(bundle_dir + "/Controller", [])]
+    while todo:
+        dir_name, parts = todo.pop()
+        for name, is_dir in scanDirectory(dir_name):
+            if is_dir:
+                todo.append((dir_name + "/" + name, parts + [name]))
+            elif name.endswith('Controller.php'):
+                path = dir_name + "/" + name
+                controller = '/'.join(parts + [name[:-len('Controller.php')]])
+                controllers.append((path, parseController(path, bundle_prefix, controller)))
+    return controllers
+
+
+API_NAMESPACE = re.compile(r'^namespace\s+([\w\\]+)')
+API_CLASS = re.compile(r'^\s*(?:(?:abstract|final)\s+)*(class|interface|trait)\s+(\w+)')
+API_METHOD = re.compile(r'^\s*(?:(?:public|protected|private|static|abstract|final)\s+)*function\s+&?\s*(\w+)\s*\(')
+API_CONSTANT = re.compile(r'^\s*(?:(?:public|protected|private|final)\s+)*const\s+(\w+)')
+
+
+def parseApiFile(path, relative_path):
+    # (name, kind, path, line) of the classes, interfaces and traits of a PHP
+    # file and of their methods and constants. Classes are named with their
+    # namespace (Symfony\Component\HttpFoundation\Request), members with
+    # their class (Symfony\...\Request::getMethod).
+    symbols = []
+    namespace = ''
+    class_name = None
+    try:
+        f = open(path)
+        try:
+            lines = f.readlines()
+        finally:
+            f.close()
+    except (IOError, UnicodeDecodeError):
+        return symbols
+    for i, line in enumerate(lines):
+        if 'function' in line:
+            match = API_METHOD.match(line)
+            if match and class_name:
+                symbols.append((class_name + '::' + match.group(1), 'method', relative_path, i + 1))
+        elif 'const' in line:
+            match = API_CONSTANT.match(line)
+            if match and class_name:
+                symbols.append((class_name + '::' + match.group(1), 'constant', relative_path, i + 1))
+        elif line.startswith('namespace'):
+            match = API_NAMESPACE.match(line)
+            if match:
+                namespace = match.group(1) + '\\'
+        else:
+            match = API_CLASS.match(line)
+            if match:
+                class_name = namespace + match.group(2)
+                symbols.append((class_name, match.group(1), relative_path, i + 1))
+    return symbols
+
+
+def scanApi(base_directory, workers=4):
+    # Symbols of the PHP sources below vendor/symfony, tests left out
+    api_dir = base_directory + "/vendor/symfony"
+    files = []
+    todo = [api_dir]
+    while todo:
+        dir_name = todo.pop()
+        for name, is_dir in scanDirectory(dir_name):
+            if is_dir:
+                if name not in ('Tests', 'tests', '.git'):
+                    todo.append(dir_name + "/" + name)
+            elif name.endswith('.php'):
+                path = dir_name + "/" + name
+                files.append((path, path[len(base_directory) + 1:]))
+    symbols = []
+    for result in parallelMap(parseApiFile, files, workers):
+        symbols.extend(result)
+    return symbols
+
+
+ENTITY_CLASS = re.compile(r'^\s*(?:(?:abstract|final)\s+)*class\s+(\w+)')
+ENTITY_PROPERTY = re.compile(r'^\s*(?:(?:private|protected|public|static|var)\s+)+\$(\w+)')
+ENTITY_COLUMN = re.compile(r'@(?:ORM\\)?Column\b(?:\s*\([^)]*?\btype\s*=\s*"(\w+)")?')
+ENTITY_ASSOCIATION = re.compile(r'@(?:ORM\\)?(?:ManyToOne|OneToOne|OneToMany|ManyToMany|Embedded)\s*\([^)]*?\b(?:targetEntity|class)\s*=\s*'
+    r'"?\\?([\w\\:]+?)(?:::class)?"?\s*[,)]')
+
+
+def parseEntityFile(path):
+    # [mtime, size, class, fields] of an entity, None if the file is gone.
+    # fields are the [name, type] pairs of the properties mapped with
+    # annotations, the type of an association or an embeddable is the
+    # class it points to.
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    namespace = ''
+    class_name = ''
+    fields = []
+    doc = None
+    mapping = None
+    try:
+        f = io.open(path, encoding='utf-8', errors='replace')
+        try:
+            for line in f:
+                if doc is not None:
+                    doc.append(line)
+                    if '*/' in line:
+                        mapping = ' '.join(doc)
+                        doc = None
+                elif '/**' in line:
+                    doc = [line]
+                    if '*/' in line:
+                        mapping = line
+                        doc = None
+                elif '$' in line:
+                    match = ENTITY_PROPERTY.match(line)
+                    if match and mapping:
+                        association = ENTITY_ASSOCIATION.search(mapping)
+                        column = ENTITY_COLUMN.search(mapping)
+                        if association:
+                            fields.append([match.group(1), association.group(1)])
+                        elif column:
+                            fields.append([match.group(1), column.group(1) or 'string'])
+                    mapping = None
+                elif line.startswith('namespace'):
+                    match = API_NAMESPACE.match(line)
+                    if match:
+                        namespace = match.group(1) + '\\'
+                elif not class_name:
+                    match = ENTITY_CLASS.match(line)
+                    if match:
+                        class_name = namespace + match.group(1)
+        finally:
+            f.close()
+    except IOError:
+        pass
+    return [stat.st_mtime, stat.st_size, class_name, fields]
+
+
+def entityFiles(base_directory):
+    # The entity classes of the bundles below src/
+    files = []
+    for bundle_dir in bundleDirectories(base_directory):
+        for name, is_dir in scanDirectory(bundle_dir + "/Entity"):
+            if not is_dir and isEntityFile(name):
+                files.append(bundle_dir + "/Entity/" + name)
+    return files
+
+
+def scanEntityFields(base_directory, cached, workers=4):
+    # Entries of all entities, see rescanFiles
+    return rescanFiles(base_directory, entityFiles(base_directory), cached, parseEntityFile, workers)
+
+
+DQL_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+([\w\\:]+(?:\.\w+)?)\s+(?:AS\s+)?(\w+)', re.I)
+BUILDER_FROM = re.compile(r'''->\s*from\(\s*['"]([\w\\:]+)['"]\s*,\s*['"](\w+)['"]''')
+BUILDER_JOIN = re.compile(r'''->\s*(?:inner|left)?[jJ]oin\(\s*['"](\w+\.\w+)['"]\s*,\s*['"](\w+)['"]''')
+BUILDER_CREATE = re.compile(r'''(?:getRepository\(\s*['"]([\w\\:]+)['"]\s*\)\s*->\s*)?createQueryBuilder\(\s*['"](\w+)['"]''')
+FIND_BY = re.compile(r'''(?:getRepository\(\s*['"]([\w\\:]+)['"]\s*\)\s*->\s*)?find(?:One)?By\s*\(''')
+DQL_FIELD = re.compile(r'^(\w+)((?:\.\w+)*)\.(\w*)$')
+
+
+def entityFieldQuery(context, search_prefix):
+    # Finds out if the string in front of the cursor asks for the fields of
+    # an entity. context is the code up to the cursor. Returns the entity
+    # name, the associations to follow from there and the typed word:
+    #   ... FROM AcmeBlogBundle:Post p JOIN p.author a WHERE a.na
+    #       -> ('AcmeBlogBundle:Post', ['author'], 'na')
+    #   ->getRepository('AcmeBlogBundle:Post')->findBy(array('ti
+    #       -> ('AcmeBlogBundle:Post', [], 'ti')
+    # The entity is '' for the repository the code is in ($this->findBy,
+    # createQueryBuilder('p')). None if no fields are asked for.
+    match = DQL_FIELD.match(search_prefix)
+    if match:
+        definitions = []
+        for pattern in (DQL_ALIAS, BUILDER_FROM, BUILDER_JOIN):
+            for definition in pattern.finditer(context):
+                definitions.append((definition.start(), definition.group(1), definition.group(2)))
+        for definition in BUILDER_CREATE.finditer(context):
+            definitions.append((definition.start(), definition.group(1) or '', definition.group(2)))
+        definitions.sort()
+        aliases = {}
+        for position, entity, alias in definitions:
+            if '.' in entity:
+                owner, association = entity.split('.', 1)
+                if owner in aliases:
+                    aliases[alias] = (aliases[owner][0], aliases[owner][1] + [association])
+            else:
+                aliases[alias] = (entity, [])
+        alias = aliases.get(match.group(1))
+        if alias:
+            return alias[0], alias[1] + [name for name in match.group(2).split('.') if name], match.group(3)
+        return None
+    if not re.match(r'^\w*$', search_prefix):
+        return None
+    # an array key in the criteria or the order of findBy/findOneBy
+    before = context[:len(context) - len(search_prefix)]
+    if not before.endswith("'") and not before.endswith('"'):
+        return None
+    call = None
+    for call in FIND_BY.finditer(before, max(0, len(before) - 500)):
+        pass
+    if not call:
+        return None
+    arguments = before[call.end():-1]
+    if ';' in arguments or not re.search(r'(?:array\s*\(|\[|,)\s*$', arguments):
+        return None
+    return call.group(1) or '', [], search_prefix
+
+
+def repositoryEntity(base_directory, path):
+    # Bundle notation of the entity of a repository class, e.g.
+    # AcmeBlogBundle:Post for src/Acme/BlogBundle/Repository/PostRepository.php
+    relative_path = path and projectPath(base_directory, path)
+    if not relative_path:
+        return ''
+    parts = relative_path.split('/')
+    if len(parts) < 4 or parts[0] != 'src' or not parts[-1].endswith('Repository.php'):
+        return ''
+    return parts[1] + parts[2] + ':' + parts[-1][:-len('Repository.php')]
+
+
+def infoIndex(info, tipstring):
+    # CompletionIndex of the [name, details] pairs of routes or services
+    details = {}
+    for name, detail in info:
+        details[name] = detail
+    return CompletionIndex([name for name, detail in info], tipstring, details)
+
+
+def parseUrlGenerator(path):
+    # Reads the routes from the url generator Symfony dumps to the cache
+    # directory. Every route is declared on a single line in there:
+    #   'name' => array (variables, defaults, requirements, tokens),
+    # Symfony 2.0 only declares the names: 'name' => true,
+    names = []
+    info = []
+    in_routes = False
+    f = open(path)
+    try:
+        for line in f:
+            if not in_routes:
+                in_routes = '$declaredRoute' in line and 'array(' in line
+                continue
+            if line.strip().startswith(')'):
+                break
+            match = ROUTE_LINE.match(line)
+            if not match:
+                continue
+            name = phpUnescape(match.group(1))
+            properties = match.group(2)
+            pattern = ''
+            tokens_start = ROUTE_TOKENS.search(properties)
+            if tokens_start:
+                tokens = properties[tokens_start.end():]
+                host_tokens = ROUTE_HOST_TOKENS.search(tokens)
+                if host_tokens:
+                    tokens = tokens[:host_tokens.start()]
+                # the tokens are stored in reverse order
+                for token in ROUTE_TOKEN.finditer(tokens):
+                    if token.group(1) == 'text':
+                        pattern = phpUnescape(token.group(2)) + pattern
+                    else:
+                        pattern = phpUnescape(token.group(2)) + '{' + phpUnescape(token.group(4)) + '}' + pattern
+            method = ROUTE_METHOD.search(properties)
+            names.append(name)
+            info.append([name, (method and phpUnescape(method.group(1)) or 'ANY') + '  ' + pattern])
+    finally:
+        f.close()
+    return names, info
+
+
+class ServiceDefinition(object):
+    # What the service quick panels show of a service. Class and tag names
+    # repeat a lot, they are interned like the names of the indexes.
+
+    __slots__ = ('class_name', 'scope', 'tags', 'alias')
+
+    def __init__(self, class_name='', scope='', tags=(), alias=''):
+        self.class_name = internName(class_name or '')
+        self.scope = internName(scope or '')
+        self.tags = tuple([internName(tag) for tag in tags])
+        self.alias = alias or ''
+
+    def __str__(self):
+        if self.alias:
+            return 'alias for "' + self.alias + '"'
+        text = (self.scope or 'container') + '  ' + self.class_name
+        if self.tags:
+            text += '  [' + ', '.join(self.tags) + ']'
+        return text
+
+    def dump(self):
+        return [self.class_name, self.scope, list(self.tags), self.alias]
+
+
+def serviceIndex(services):
+    # CompletionIndex of the (id, ServiceDefinition) pairs of a container
+    details = {}
+    for name, service in services:
+        details[name] = service
+    return CompletionIndex([name for name, service in services], ' [Service]', details)
+
+
+def parseContainerXml(source):
+    # Reads the public services with class, scope, tags and aliases from a
+    # container in XML: the dump in the cache directory (<services><service>
+    # with <tag> children) or the output of container:debug --format=xml
+    # (<definition> and <alias> with the tags in <tags>). The file is parsed
+    # incrementally and every service is dropped again once it has been read.
+    services = []
+    stack = []
+    parents = []
+    tags = None
+    for event, elem in iterparse(source, events=('start', 'end')):
+        tag = elem.tag.split('}')[-1]
+        if event == 'start':
+            stack.append(tag)
+            parents.append(elem)
+            depth = len(stack)
+            if tag in ('service', 'definition') and stack[:-1] in (['container'], ['container', 'services']):
+                tags = []
+                service_depth = depth
+            elif tag == 'tag' and tags is not None and (depth == service_depth + 1 or
+                    (depth == service_depth + 2 and stack[-2] == 'tags')):
+                if elem.get('name'):
+                    tags.append(elem.get('name'))
+            continue
+        depth = len(stack)
+        stack.pop()
+        parents.pop()
+        if tags is not None and depth == service_depth:
+            service_id = elem.get('id')
+            if service_id and elem.get('public') != 'false' and elem.get('abstract') != 'true':
+                services.append((service_id, ServiceDefinition(elem.get('class'), elem.get('scope'), tags, elem.get('alias'))))
+            tags = None
+            parents[-1].clear()
+        elif tag == 'alias' and depth == 2:
+            if elem.get('id') and elem.get('public') != 'false':
+                services.append((elem.get('id'), ServiceDefinition(alias=elem.get('service'))))
+            parents[-1].clear()
+    return services
+
+
+def parseContainerDebug(output):
+    # Plain text container:debug of Symfony versions without --format:
+    #   name    scope    class name
+    #   name    n/a      alias for other
+    # Lines of other shapes keep the service name and nothing else.
+    services = []
+    for line in output.splitlines():
+        if not line.strip() or line.startswith('Name') or line.startswith('[container]'):
+            continue
+        parts = line.split(None, 2)
+        rest = ' '.join(parts[1:])
+        if 'alias for' in rest:
+            services.append((parts[0], ServiceDefinition(alias=rest.split('alias for', 1)[1].strip().strip('"'))))
+        elif len(parts) == 3:
+            services.append((parts[0], ServiceDefinition(parts[2].strip(), parts[1])))
+        else:
+            services.append((parts[0], ServiceDefinition(rest)))
+    return services
+
+
+def xmlSource(text):
+    # File object for iterparse over console output
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return io.BytesIO(text)
+
+
+TRANSLATION_FILE = re.compile(r'^[^.]+\.[^.]+\.(yml|yaml|xlf|xliff)$')
+YAML_KEY = re.compile(r'''^(?:"((?:[^"\\]|\\.)*)"|'((?:[^']|'')*)'|([^\s#'"{\[\-][^#]*?))[ \t]*:(?:[ \t]+(.*))?$''')
+
+
+def translationDirectories(base_directory):
+    # The directories message catalogs are loaded from, whether they exist
+    # or not
+    dirs = [base_directory + "/app/Resources/translations"]
+    for bundle_dir in bundleDirectories(base_directory):
+        dirs.append(bundle_dir + "/Resources/translations")
+    return dirs
+
+
+def translationFiles(base_directory):
+    # Paths of the message catalogs (<domain>.<locale>.<format>) of a project
+    files = []
+    for dir_name in translationDirectories(base_directory):
+        for name, is_dir in scanDirectory(dir_name):
+            if not is_dir and TRANSLATION_FILE.match(name):
+                files.append(dir_name + "/" + name)
+    return files
+
+
+def parseTranslationYaml(path):
+    # Keys of a YAML catalog, nested keys are joined with '.'. The file is
+    # read line by line and only what catalogs use is understood: mappings
+    # by indentation, quoted keys, comments and multi-line values.
+    keys = []
+    parents = []  # [indent, key, has children]
+    value_indent = None
+    f = io.open(path, encoding='utf-8', errors='replace')
+    try:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            indent = len(line) - len(line.lstrip(' '))
+            if value_indent is not None:
+                # the lines of a multi-line value are indented deeper
+                if indent > value_indent:
+                    continue
+                value_indent = None
+            match = YAML_KEY.match(stripped)
+            if not match:
+                continue
+            while parents and parents[-1][0] >= indent:
+                parent = parents.pop()
+                if not parent[2]:
+                    keys.append('.'.join([p[1] for p in parents] + [parent[1]]))
+            if match.group(1) is not None:
+                key = match.group(1).replace('\\"', '"').replace('\\\\', '\\')
+            elif match.group(2) is not None:
+                key = match.group(2).replace("''", "'")
+            else:
+                key = match.group(3)
+            value = (match.group(4) or '').strip()
+            if parents:
+                parents[-1][2] = True
+            if not value or value.startswith('#'):
+                parents.append([indent, key, False])
+            else:
+                keys.append('.'.join([p[1] for p in parents] + [key]))
+                value_indent = indent
+    finally:
+        f.close()
+    while parents:
+        parent = parents.pop()
+        if not parent[2]:
+            keys.append('.'.join([p[1] for p in parents] + [parent[1]]))
+    return keys
+
+
+def parseTranslationXliff(path):
+    # Keys of an XLIFF catalog: the resname of every trans-unit, or its
+    # source like Symfony does. Every unit is dropped once it has been read.
+    keys = []
+    for event, elem in iterparse(path):
+        if elem.tag.split('}')[-1] != 'trans-unit':
+            continue
+        key = elem.get('resname')
+        if not key:
+            for child in elem:
+                if child.tag.split('}')[-1] == 'source':
+                    key = child.text
+                    break
+        if key:
+            keys.append(key)
+        elem.clear()
+    return keys
+
+
+def parseCatalog(path):
+    # [mtime, size, keys] of a message catalog, None if it is gone. A
+    # catalog which can't be parsed has no keys until it changes again.
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    try:
+        if path.endswith('.yml') or path.endswith('.yaml'):
+            keys = parseTranslationYaml(path)
+        else:
+            keys = parseTranslationXliff(path)
+    except (IOError, SyntaxError, UnicodeError):
+        keys = []
+    return [stat.st_mtime, stat.st_size, sorted(set(keys))]
+
+
+def scanTranslations(base_directory, cached, workers=4):
+    # Entries of all message catalogs, see rescanFiles
+    return rescanFiles(base_directory, translationFiles(base_directory), cached, parseCatalog, workers)
+
+
+TRANS_CALL = re.compile(r'''\btrans(?:Choice)?\(\s*['"][^'"]*$''')
+TRANS_FILTER = re.compile(r'''^[^'"\n]*['"]\s*\|\s*trans(?:choice)?\b''')
+TRANS_TAG = re.compile(r'\{%-?\s*(trans|transchoice|endtrans|endtranschoice)\b')
+
+
+def isTranslationContext(context, following):
+    # True if the string at the cursor is a translation key: the argument of
+    # ->trans( or ->transChoice(, a string followed by the trans filter or
+    # text in a {% trans %} block. context is the code up to the cursor,
+    # following the code behind it.
+    if TRANS_CALL.search(context) or TRANS_FILTER.match(following):
+        return True
+    tags = TRANS_TAG.findall(context)
+    return bool(tags) and not tags[-1].startswith('end')
+
+
+class ConsoleJob(object):
+    # Runs a shell command in the background. Its output (stdout and
+    # stderr) is collected in memory until takeOutput() is called, if more
+    # than max_pending characters pile up the oldest output is dropped, 0
+    # keeps all of it.
+    # cancel() kills the command together with all of its children.
+    # Instead of a shell command a function returning the output can be
+    # run, e.g. to send the command to the console worker.
+
+    def __init__(self, command, cwd, max_pending=1000000, title=None, function=None):
+        self.command = command
+        self.cwd = cwd
+        self.max_pending = max_pending
+        self.title = title or command
+        self.function = function
+        self.conflict = conflictKey(self.title)
+        self.queued = time.time()
+        self.process = None
+        self.pending = []
+        self.pending_size = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+        self.started = None
+        self.finished = None
+        self.cancelled = False
+        self.returncode = None
+        self.stopper = None
+
+    def start(self):
+        self.started = time.time()
+        if self.function:
+            thread = threading.Thread(target=self.call)
+        else:
+            options = {}
+            if os.name == 'posix':
+                options['preexec_fn'] = os.setsid
+            self.process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                shell=True, cwd=self.cwd, **options)
+            thread = threading.Thread(target=self.read)
+        thread.setDaemon(True)
+        thread.start()
+
+    def call(self):
+        try:
+            self.append(self.function() or '')
+            self.returncode = 0
+        finally:
+            self.finished = time.time()
+
+    def read(self):
+        fd = self.process.stdout.fileno()
+        # a character may be split over two chunks
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        while True:
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                self.append(decoder.decode(b'', True))
+                break
+            self.append(decoder.decode(chunk))
+        self.returncode = self.process.wait()
+        self.finished = time.time()
+
+    def append(self, text):
+        self.lock.acquire()
+        try:
+            self.pending.append(text)
+            self.pending_size += len(text)
+            while self.max_pending and self.pending_size > self.max_pending and len(self.pending) > 1:
+                dropped = self.pending.pop(0)
+                self.pending_size -= len(dropped)
+                self.skipped += len(dropped)
+        finally:
+            self.lock.release()
+
+    def takeOutput(self):
+        self.lock.acquire()
+        try:
+            text = ''.join(self.pending)
+            if self.skipped:
+                text = '[... %d characters of output skipped ...]\n' % self.skipped + text
+            self.pending = []
+            self.pending_size = 0
+            self.skipped = 0
+            return text
+        finally:
+            self.lock.release()
+
+    def isRunning(self):
+        return self.started is not None and self.finished is None
+
+    def isWaiting(self):
+        return self.started is None and not self.cancelled
+
+    def status(self):
+        if self.cancelled:
+            return 'cancelled'
+        if self.started is None:
+            return 'queued'
+        if self.finished is None:
+            return 'running'
+        if self.returncode == 0:
+            return 'finished'
+        return 'failed (%s)' % self.returncode
+
+    def duration(self):
+        if not self.started:
+            return 0
+        return (self.finished or time.time()) - self.started
+
+    def waited(self):
+        return (self.started or self.finished or time.time()) - self.queued
+
+    def cancel(self):
+        if self.isWaiting():
+            self.cancelled = True
+            self.finished = time.time()
+            return
+        if not self.isRunning() or not (self.process or self.stopper):
+            return
+        # set first, the stopper may make the function return at once
+        self.cancelled = True
+        if self.process:
+            killProcess(self.process)
+        else:
+            self.stopper()
+
+
+def killProcess(process):
+    # Kills a process started by ConsoleJob, ConsoleWorker or ShardedTestRun with
+    # its children (the shell and php)
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGTERM)
+        else:
+            subprocess.call('taskkill /F /T /PID %d' % process.pid, shell=True)
+    except OSError:
+        pass
+
+
+def findTestFiles(path):
+    files = []
+    for dir_name, dir_names, file_names in os.walk(path):
+        files.extend([os.path.join(dir_name, name) for name in file_names if name.endswith('Test.php')])
+    return files
+
+
+def partitionByDuration(files, durations, shards):
+    # Longest files first, each one to the shard with the least work so far.
+    # Files without a recorded duration count as an average file.
+    known = [durations[f] for f in files if f in durations]
+    default = known and sum(known) / len(known) or 1.0
+    weighted = sorted([(durations.get(f, default), f) for f in files], reverse=True)
+    heap = [(0.0, i, []) for i in range(min(shards, len(files)))]
+    for duration, f in weighted:
+        total, i, shard = heapq.heappop(heap)
+        shard.append(f)
+        heapq.heappush(heap, (total + duration, i, shard))
+    return [shard for total, i, shard in sorted(heap, key=lambda entry: entry[1])]
+
+
+def parseJunit(path):
+    # All testcases of a PHPUnit JUnit log as (file, name, time, failure)
+    # tuples plus the number of assertions
+    testcases = []
+    assertions = 0
+    for event, elem in iterparse(path):
+        if elem.tag != 'testcase':
+            continue
+        failure = None
+        for child in elem:
+            if child.tag in ('failure', 'error'):
+                failure = child.text or child.get('message') or child.tag
+        name = (elem.get('class') or '') + '::' + (elem.get('name') or '')
+        testcases.append((elem.get('file'), name, float(elem.get('time') or 0), failure))
+        assertions += int(elem.get('assertions') or 0)
+        elem.clear()
+    return testcases, assertions
+
+
+class ShardedTestRun(object):
+    # Runs test files with phpunit in several processes at the same time.
+    # Every shard gets its own copy of the phpunit configuration of app/
+    # which only lists the files of the shard. The JUnit logs of all shards
+    # are merged into one summary and the time every file took is recorded
+    # in durations to balance the next run.
+
+    def __init__(self, base_directory, files, shards, durations, phpunit='phpunit'):
+        self.base_directory = base_directory
+        self.shards = partitionByDuration(files, durations, shards)
+        self.durations = durations
+        self.phpunit = phpunit
+        self.processes = []
+        self.cancelled = False
+
+    def writeConfig(self, files, path):
+        config = self.base_directory + "/app/phpunit.xml"
+        if not os.path.isfile(config):
+            config = config + '.dist'
+        if os.path.isfile(config):
+            tree = ElementTree.parse(config)
+            root = tree.getroot()
+        else:
+            root = ElementTree.Element('phpunit')
+            tree = ElementTree.ElementTree(root)
+        for testsuites in root.findall('testsuites'):
+            root.remove(testsuites)
+        testsuite = ElementTree.SubElement(ElementTree.SubElement(root, 'testsuites'), 'testsuite', name='SymfonyCommander')
+        for test_file in files:
+            ElementTree.SubElement(testsuite, 'file').text = test_file
+        tree.write(path)
+
+    def run(self):
+        # relative paths in the configuration are relative to app/
+        log_dir = tempfile.mkdtemp(prefix='symfony-commander-')
+        configs = []
+        started = time.time()
+        try:
+            for i, files in enumerate(self.shards):
+                config = self.base_directory + "/app/.symfony-commander-shard-%d.xml" % i
+                log = os.path.join(log_dir, 'shard-%d.xml' % i)
+                self.writeConfig(files, config)
+                configs.append(config)
+                if self.cancelled:
+                    break
+                options = {}
+                if os.name == 'posix':
+                    options['preexec_fn'] = os.setsid
+                # the output goes to a file, a shard writing more than a
+                # pipe can buffer would wait for the shards before it
+                output = open(os.path.join(log_dir, 'shard-%d.out' % i), 'wb')
+                try:
+                    process = subprocess.Popen('%s -c "%s" --log-junit "%s"' % (self.phpunit, config, log),
+                        stdout=output, stderr=subprocess.STDOUT, shell=True, cwd=self.base_directory, **options)
+                finally:
+                    output.close()
+                self.processes.append((process, log))
+            outputs = []
+            for i, (process, log) in enumerate(self.processes):
+                process.wait()
+                f = open(os.path.join(log_dir, 'shard-%d.out' % i), 'rb')
+                try:
+                    outputs.append(f.read())
+                finally:
+                    f.close()
+            return self.summary(outputs, time.time() - started)
+        finally:
+            for config in configs:
+                if os.path.exists(config):
+                    os.remove(config)
+            shutil.rmtree(log_dir, True)
+
+    def summary(self, outputs, duration):
+        tests = 0
+        assertions = 0
+        failures = []
+        broken = []
+        file_times = {}
+        for (process, log), output in zip(self.processes, outputs):
+            if not os.path.isfile(log):
+                if not self.cancelled:
+                    broken.append((output or b'').decode('utf-8', 'replace')[-2000:])
+                continue
+            testcases, shard_assertions = parseJunit(log)
+            assertions += shard_assertions
+            for test_file, name, test_time, failure in testcases:
+                tests += 1
+                if test_file:
+                    file_times[test_file] = file_times.get(test_file, 0) + test_time
+                if failure:
+                    failures.append((name, failure))
+        self.durations.update(file_times)
+        lines = ['PHPUnit: %d shards, %d tests, %d assertions, %d failures in %.1fs' % (len(self.shards), tests, assertions, len(failures), duration)]
+        if self.cancelled:
+            lines.append('Cancelled.')
+        for i, (name, failure) in enumerate(failures):
+            lines.append('')
+            lines.append('%d) %s' % (i + 1, name))
+            lines.append(failure.strip())
+        for output in broken:
+            lines.append('')
+            lines.append('A shard did not write a JUnit log:')
+            lines.append(output.strip())
+        return '\n'.join(lines) + '\n'
+
+    def cancel(self):
+        self.cancelled = True
+        for process, log in self.processes:
+            if process.poll() is None:
+                killProcess(process)
+
+
+class JobScheduler(object):
+    # The console jobs of one project. Up to max_jobs jobs run at the same
+    # time, jobs with the same conflict key run one after another and a
+    # command which is already waiting is not queued a second time.
+    # schedule() has to be called regularly to start waiting jobs.
+
+    def __init__(self, max_jobs=2):
+        self.max_jobs = max_jobs
+        self.queue = []
+        self.running = []
+        self.done = []
+
+    def submit(self, job):
+        for waiting in self.queue:
+            if waiting.title == job.title and waiting.isWaiting():
+                return waiting
+        self.queue.append(job)
+        self.schedule()
+        return job
+
+    def schedule(self):
+        for job in [job for job in self.running if not job.isRunning()]:
+            self.running.remove(job)
+            self.done.append(job)
+        for job in [job for job in self.queue if job.cancelled]:
+            self.queue.remove(job)
+            self.done.append(job)
+        del self.done[:-50]
+        for job in list(self.queue):
+            if len(self.running) >= max(self.max_jobs, 1):
+                break
+            if [running for running in self.running if running.conflict == job.conflict]:
+                continue
+            self.queue.remove(job)
+            job.start()
+            self.running.append(job)
+
+    def jobs(self):
+        return self.running + self.queue + list(reversed(self.done))
+
+    def activeJobs(self):
+        return self.running + self.queue
+
+
+class PrefixStates(list):
+    # The result of a search() which only holds some of the entries starting
+    # with the word, a longer word has to be searched again instead of
+    # continued
+    pass
+
+
+class CompletionIndex(object):
+    # Sorted list of the names of one kind of completion (routes, services, ...)
+    # for a single project. Prefix lookups are done with a binary search, the
+    # lower case name and the segment boundaries used by the fuzzy matching
+    # are built once per entry. details (name -> text, or the
+    # ServiceDefinition of a service) are kept for the quick panels of routes
+    # and services. An index created without names
+    # is a placeholder for data that has not been loaded yet.
+    # starts maps a character to the sorted positions of the entries which
+    # have it at the start of a segment, chars are all characters of the
+    # lower case names. Both are built on the first fuzzy search and again
+    # after the index changed.
+
+    __slots__ = ('loaded', 'tipstring', 'scanned', 'generation', 'names', 'details', 'lowered', 'bounds', 'size',
+        'starts', 'chars', 'starts_generation')
+
+    def __init__(self, names=None, tipstring='', details=None):
+        self.loaded = names is not None
+        self.tipstring = tipstring
+        self.scanned = 0
+        self.generation = 0
+        self.names = sorted(set([internName(name) for name in names or ()]))
+        self.details = None
+        if details is not None:
+            self.details = [details.get(name, '') for name in self.names]
+        self.lowered = []
+        for name in self.names:
+            lowered = name.lower()
+            self.lowered.append(lowered == name and name or lowered)
+        self.bounds = [boundaries(name) for name in self.names]
+        self.starts = None
+        self.chars = None
+        self.starts_generation = 0
+        self.size = self.estimateSize()
+
+    def estimateSize(self):
+        # bytes used by the entries, strings shared with other entries are
+        # counted every time
+        size = sys.getsizeof(self.names) * 3
+        for i, name in enumerate(self.names):
+            size += sys.getsizeof(name)
+            if self.lowered[i] is not name:
+                size += sys.getsizeof(self.lowered[i])
+            if self.details:
+                size += sys.getsizeof(self.details[i])
+        return size
+
+    def info(self):
+        # [name, details] of every entry for a quick panel
+        details = self.details or [''] * len(self.names)
+        return [[name, '%s' % (details[i],)] for i, name in enumerate(self.names)]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def prefixRange(self, prefix):
+        names = self.names
+        if not prefix:
+            return 0, len(names)
+        start = bisect.bisect_left(names, prefix)
+        if ord(prefix[-1]) < 127:
+            # the names sort before the prefix with its last character raised
+            return start, bisect.bisect_left(names, prefix[:-1] + chr(ord(prefix[-1]) + 1), start)
+        end = start
+        while end < len(names) and names[end].startswith(prefix):
+            end += 1
+        return start, end
+
+    def buildStarts(self):
+        if self.starts is not None and self.starts_generation == self.generation:
+            return
+        generation = self.generation
+        starts = {}
+        chars = set()
+        lowered = self.lowered
+        for i, bounds in enumerate(self.bounds):
+            name = lowered[i]
+            chars.update(name)
+            for first in set([name[bound] for bound in bounds if bound < len(name)]):
+                positions = starts.get(first)
+                if positions is None:
+                    positions = starts[first] = array.array('i')
+                positions.append(i)
+        self.starts = starts
+        self.chars = chars
+        self.starts_generation = generation
+
+    def segmentStarts(self, char, start, end):
+        # Positions between start and end of the entries with char at the
+        # start of a segment
+        self.buildStarts()
+        positions = self.starts.get(char)
+        if not positions:
+            return ()
+        low = bisect.bisect_left(positions, start)
+        return positions[low:bisect.bisect_left(positions, end, low)]
+
+    def queryParts(self, prefix, search_prefix=False):
+        # The number of characters of an entry which are already typed, the
+        # segments an entry has to start with and the current word
+        if search_prefix and search_prefix != prefix:
+            lookup = search_prefix
+            cut = segmentCut(search_prefix)
+        else:
+            lookup = prefix
+            cut = 0
+        head = lookup[:max(lookup.rfind(':'), lookup.rfind('.')) + 1]
+        return cut, head, lookup[len(head):].lower()
+
+    def search(self, prefix, search_prefix=False, previous=None, limit=0):
+        # (position, score, last hit, jumped) of every entry which starts
+        # with the already typed segments and contains the current word as
+        # fuzzy subsequence behind them, shorter names start with a higher
+        # score. The first character of the word has to start a segment of
+        # the entry. previous are the word and the result of an earlier
+        # search for the beginning of the current word, then only these
+        # entries are continued with the rest of the word; one whose match
+        # jumped ahead is matched again from the start if the rest does not
+        # fit behind it, as the word may still fit without that jump.
+        # If at least limit entries start with the word itself, just the
+        # limit shortest of them are returned without any fuzzy matching.
+        cut, head, word = self.queryParts(prefix, search_prefix)
+        if previous and not isinstance(previous[1], PrefixStates):
+            done, states = previous
+            rest = word[len(done):]
+        else:
+            start, end = self.prefixRange(head)
+            last = len(head) - 1
+            names = self.names
+            if word:
+                hits_start, hits_end = self.prefixRange(head + word)
+                if limit and hits_end - hits_start >= limit:
+                    # the score fuzzyMatch gives to characters in a row
+                    score = 6 * len(word)
+                    last += len(word)
+                    hits = heapq.nsmallest(limit, range(hits_start, hits_end), key=lambda i: len(names[i]))
+                    self.scanned = hits_end - hits_start
+                    return PrefixStates([(i, score - len(names[i]) * 0.01, last, False) for i in hits])
+                candidates = self.segmentStarts(word[0], start, end)
+            else:
+                candidates = range(start, end)
+            states = [(i, -len(names[i]) * 0.01, last, False) for i in candidates]
+            rest = word
+        self.scanned = len(states)
+        if not rest:
+            return states
+        self.buildStarts()
+        for char in rest:
+            if char not in self.chars:
+                # no name has it
+                return []
+        lowered = self.lowered
+        bounds = self.bounds
+        result = []
+        for i, score, last, jumped in states:
+            state = fuzzyMatch(lowered[i], bounds[i], rest, score, last)
+            if state:
+                result.append((i, state[0], state[1], jumped or state[2]))
+            elif jumped:
+                state = fuzzyMatch(lowered[i], bounds[i], word, -len(lowered[i]) * 0.01, len(head) - 1)
+                if state:
+                    result.append((i, state[0], state[1], state[2]))
+        return result
+
+    def matches(self, prefix, search_prefix=False, states=None, limit=0):
+        # (score, trigger, text) of the best limit entries found by search()
+        cut, head, word = self.queryParts(prefix, search_prefix)
+        if states is None:
+            states = self.search(prefix, search_prefix, limit=limit)
+        names = self.names
+        if word:
+            key = itemgetter(1)
+        else:
+            key = lambda state: 0
+        if limit and len(states) > limit:
+            states = heapq.nlargest(limit, states, key=key)
+        elif word:
+            states = sorted(states, key=key, reverse=True)
+        tipstring = self.tipstring
+        return [(key(state), names[state[0]] + tipstring, names[state[0]][cut:]) for state in states]
+
+    def completions(self, prefix, search_prefix=False, limit=0):
+        return topMatches([self.matches(prefix, search_prefix, limit=limit)], limit)
+
+    def add(self, name, detail=''):
+        name = internName(name)
+        i = bisect.bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name:
+            return False
+        self.generation += 1
+        self.names.insert(i, name)
+        if self.details is not None:
+            self.details.insert(i, detail)
+        lowered = name.lower()
+        self.lowered.insert(i, lowered == name and name or lowered)
+        self.bounds.insert(i, boundaries(name))
+        return True
+
+    def remove(self, name):
+        i = bisect.bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name:
+            self.generation += 1
+            del self.names[i]
+            if self.details is not None:
+                del self.details[i]
+            del self.lowered[i]
+            del self.bounds[i]
+            return True
+        return False
+
+
+class TranslationIndex(CompletionIndex):
+    # The translation keys of all message catalogs of a project, merged over
+    # locales and domains. files maps the path of every catalog (relative to
+    # the project) to [mtime, size, keys] and counts how many catalogs
+    # define each key, a key is only removed with the last of them. All
+    # catalogs share one interned string per key. An index which is not
+    # loaded may still hold the files of the disk cache, loadTranslations
+    # then only parses the catalogs which changed.
+
+    __slots__ = ('files', 'counts')
+
+    def __init__(self, files=None, loaded=None):
+        if loaded is None:
+            loaded = files is not None
+        self.files = {}
+        self.counts = {}
+        for path, entry in (files or {}).items():
+            self.files[path] = [entry[0], entry[1], [internName(key) for key in entry[2]]]
+        if loaded:
+            for entry in self.files.values():
+                for key in entry[2]:
+                    self.counts[key] = self.counts.get(key, 0) + 1
+        CompletionIndex.__init__(self, loaded and list(self.counts) or None, ' [Trans]')
+
+    def estimateSize(self):
+        size = CompletionIndex.estimateSize(self) + sys.getsizeof(self.counts)
+        for entry in self.files.values():
+            size += sys.getsizeof(entry[2])
+        return size
+
+    def setFile(self, path, entry):
+        # Replaces the keys of a catalog, entry None removes it. Returns True
+        # if the index has changed.
+        changed = False
+        old = self.files.pop(path, None)
+        if entry:
+            entry = self.files[path] = [entry[0], entry[1], [internName(key) for key in entry[2]]]
+            for key in entry[2]:
+                self.counts[key] = self.counts.get(key, 0) + 1
+                if self.counts[key] == 1:
+                    changed = self.add(key) or changed
+        if old:
+            for key in old[2]:
+                self.counts[key] -= 1
+                if not self.counts[key]:
+                    del self.counts[key]
+                    changed = self.remove(key) or changed
+        self.size = self.estimateSize()
+        return changed
+
+
+class EntityFieldIndex(object):
+    # The mapped fields and associations of the entities of a project for
+    # DQL and findBy completions. files maps the path of every entity class
+    # (relative to the project) to [mtime, size, class, fields], see
+    # parseEntityFile. names finds the file of an entity by lower case
+    # class name, bundle notation (acmeblogbundle:post) or short name. The
+    # completion index of the fields of an entity is built when it is first
+    # asked for. An index which is not loaded may still hold the files of
+    # the disk cache, loadEntityFields then only parses the changed files.
+
+    __slots__ = ('loaded', 'files', 'names', 'indexes', 'size')
+
+    def __init__(self, files=None, loaded=None):
+        if loaded is None:
+            loaded = files is not None
+        self.loaded = loaded
+        self.files = {}
+        for path, entry in (files or {}).items():
+            self.files[path] = [entry[0], entry[1], internName(entry[2]), [[internName(name), internName(field_type)]
+                for name, field_type in entry[3]]]
+        self.refresh()
+
+    def refresh(self):
+        self.names = {}
+        self.indexes = {}
+        self.size = sys.getsizeof(self.files)
+        for path, entry in self.files.items():
+            parts = path.split('/')
+            short_name = parts[-1][:-4]
+            self.names.setdefault(short_name.lower(), path)
+            self.names[(parts[1] + parts[2] + ':' + short_name).lower()] = path
+            if entry[2]:
+                self.names[entry[2].lower()] = path
+            self.size += sys.getsizeof(entry[3]) * 3
+
+    def setFile(self, path, entry):
+        if entry:
+            self.files[path] = entry
+        else:
+            self.files.pop(path, None)
+        self.refresh()
+
+    def resolve(self, name, namespace=''):
+        # File of an entity by a name as written in PHP or DQL, names
+        # without namespace or bundle may be relative to namespace
+        name = name.lstrip('\\').lower()
+        if namespace and '\\' not in name and ':' not in name and namespace.lower() + name in self.names:
+            return self.names[namespace.lower() + name]
+        return self.names.get(name)
+
+    def target(self, path, field):
+        # File of the entity an association of the entity in path points to
+        entry = self.files.get(path)
+        for name, field_type in entry and entry[3] or ():
+            if name == field:
+                return self.resolve(field_type, entry[2][:entry[2].rfind('\\') + 1])
+
+    def index(self, path=None):
+        # CompletionIndex of the fields of an entity, or of all entities
+        index = self.indexes.get(path)
+        if index is None:
+            if path:
+                entries = [self.files[path]]
+            else:
+                entries = self.files.values()
+            names = []
+            for entry in entries:
+                names.extend([name for name, field_type in entry[3]])
+            index = self.indexes[path] = CompletionIndex(names, ' [Field]')
+        return index
+
+
+class NavigationIndex(object):
+    # Links the actions of the controllers of a project with the templates
+    # they render, in both directions:
+    #   actions: controller file -> [(line, action, templates)] by line
+    #   renders: template name -> [(controller file, line, action)]
+    # The controller files are kept by their path in the project (see
+    # projectPath), the methods take any path of the file. bundles maps the
+    # bundle prefixes to their directories. A controller is replaced as a
+    # whole when its file changes.
+
+    def __init__(self, base_directory, bundles=None):
+        self.base_directory = base_directory
+        self.loaded = bundles is not None
+        self.bundles = bundles or {}
+        self.actions = {}
+        self.renders = {}
+
+    def key(self, path):
+        return projectPath(self.base_directory, path) or path
+
+    def path(self, key):
+        # the file of a controller as found in renders
+        return self.base_directory + "/" + key
+
+    def setController(self, path, actions):
+        self.removeController(path)
+        path = self.key(path)
+        self.actions[path] = actions
+        for line, action, templates in actions:
+            for template in templates:
+                self.renders.setdefault(template, []).append((path, line, action))
+
+    def removeController(self, path):
+        path = self.key(path)
+        for line, action, templates in self.actions.pop(path, []):
+            for template in templates:
+                entries = [entry for entry in self.renders.get(template, []) if entry[0] != path]
+                if entries:
+                    self.renders[template] = entries
+                else:
+                    self.renders.pop(template, None)
+
+    def actionAt(self, path, line):
+        # the action the line belongs to
+        actions = self.actions.get(self.key(path), [])
+        i = bisect.bisect_right([entry[0] for entry in actions], line)
+        if i:
+            return actions[i - 1]
+        return None
+
+    def actionLine(self, path, action):
+        for line, name, templates in self.actions.get(self.key(path), []):
+            if name == action:
+                return line
+        return None
+
+    def viewsDirectory(self, bundle_prefix):
+        if not bundle_prefix:
+            return self.base_directory + "/app/Resources/views"
+        if bundle_prefix in self.bundles:
+            return self.bundles[bundle_prefix] + "/Resources/views"
+        return None
+
+    def templatePaths(self, name):
+        # Files of a template. If it does not exist, the templates of the
+        # same action in other formats (show.xml.twig for show.html.twig).
+        parts = name.split(':')
+        if len(parts) != 3:
+            return []
+        views = self.viewsDirectory(parts[0])
+        if not views:
+            return []
+        directory = views + (parts[1] and "/" + parts[1] or '')
+        path = directory + "/" + parts[2]
+        if os.path.isfile(path):
+            return [path]
+        action = parts[2].split('.')[0] + '.'
+        return [directory + "/" + file_name for file_name in sorted(listNames(directory)) if file_name.startswith(action)]
+
+    def controllerPath(self, bundle_prefix, controller):
+        if bundle_prefix not in self.bundles:
+            return None
+        return self.bundles[bundle_prefix] + "/Controller/" + controller + "Controller.php"
+
+
+class ApiIndex(object):
+    # Inverted index of the symbols (classes, interfaces, traits, methods,
+    # constants) of the Symfony sources: the lower case short name of every
+    # symbol (request, getmethod, ...) points to the positions of the
+    # symbols in symbols. An index created without symbols is a placeholder
+    # for data that has not been loaded yet.
+
+    __slots__ = ('loaded', 'symbols', 'tokens', 'sorted_tokens', 'size')
+
+    def __init__(self, symbols=None):
+        self.loaded = symbols is not None
+        self.symbols = []
+        self.tokens = {}
+        for name, kind, path, line in symbols or ():
+            name = internName(name)
+            self.tokens.setdefault(internName(self.shortName(name).lower()), []).append(len(self.symbols))
+            self.symbols.append((name, internName(kind), internName(path), line))
+        self.sorted_tokens = sorted(self.tokens)
+        self.size = sys.getsizeof(self.symbols) + sys.getsizeof(self.tokens) + sum([sys.getsizeof(symbol[0]) for symbol in self.symbols])
+
+    def shortName(self, name):
+        return re.split(r'::|\\', name)[-1]
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def search(self, text, limit=200):
+        # Symbols for a name as selected in a file: Request, getMethod,
+        # Request::getMethod or a class name with namespace. Without an exact
+        # hit all symbols starting with the name are returned. Classes come
+        # first, then the shortest names.
+        text = text.strip().lstrip('\\$').rstrip('(')
+        if not text:
+            return []
+        parts = text.split('::')
+        member = parts[-1].lower()
+        owner = len(parts) > 1 and parts[-2].lower() or ''
+        token = self.shortName(member)
+        positions = self.tokens.get(token)
+        if not positions:
+            positions = []
+            i = bisect.bisect_left(self.sorted_tokens, token)
+            while i < len(self.sorted_tokens) and self.sorted_tokens[i].startswith(token):
+                positions.extend(self.tokens[self.sorted_tokens[i]])
+                i += 1
+        symbols = [self.symbols[i] for i in positions]
+        if owner:
+            owner_name = self.shortName(owner)
+            symbols = [symbol for symbol in symbols if self.shortName(symbol[0].split('::')[0]).lower() == owner_name]
+            if '\\' in owner:
+                symbols = [symbol for symbol in symbols if symbol[0].split('::')[0].lower().endswith(owner)] or symbols
+        elif '\\' in member:
+            symbols = [symbol for symbol in symbols if symbol[0].lower().endswith(member)] or symbols
+        symbols.sort(key=lambda symbol: ('::' in symbol[0], len(symbol[0]), symbol[0]))
+        return symbols[:limit]
+
+
+class ProjectIndex(object):
+    # Everything kept in memory for one project: the completion indexes, the
+    # translation keys, the entity fields, the scanned vendor packages, the
+    # API index, the on disk cache and the watcher. used is the last time the project was asked for, the least
+    # recently used projects are dropped first when the indexes of all
+    # projects need more memory than allowed.
+
+    __slots__ = ('base_directory', 'routes', 'containers', 'entities', 'templates', 'common_snippets', 'translations',
+        'fields', 'navigation', 'vendors', 'api', 'disk_cache', 'watcher', 'used', 'failed')
+
+    sections = ('routes', 'containers', 'entities', 'templates')
+
+    def __init__(self, base_directory):
+        self.base_directory = base_directory
+        self.routes = CompletionIndex()
+        self.containers = CompletionIndex()
+        self.entities = CompletionIndex()
+        self.templates = CompletionIndex()
+        self.common_snippets = CompletionIndex()
+        self.translations = TranslationIndex()
+        self.fields = EntityFieldIndex()
+        self.navigation = NavigationIndex(base_directory)
+        self.vendors = None
+        self.api = ApiIndex()
+        self.disk_cache = None
+        self.watcher = None
+        self.used = time.time()
+        # section: time a load of it failed
+        self.failed = {}
+
+    def clear(self):
+        for section in self.sections + ('common_snippets',):
+            setattr(self, section, CompletionIndex())
+        self.translations = TranslationIndex()
+        self.fields = EntityFieldIndex()
+        self.navigation = NavigationIndex(self.base_directory)
+        self.vendors = None
+        self.api = ApiIndex()
+        self.failed = {}
+
+    def size(self):
+        return sum([getattr(self, section).size for section in self.sections + ('common_snippets', 'translations', 'fields', 'api')])
+
+
+def evictProjects(projects, budget, keep=None):
+    # Drops the least recently used projects until the indexes of the rest
+    # fit into budget bytes. The project keep and the last one are never
+    # dropped. Returns the dropped base directories.
+    evicted = []
+    total = sum([project.size() for project in projects.values()])
+    for project in sorted(projects.values(), key=lambda project: project.used):
+        if total <= budget or len(projects) <= 1:
+            break
+        if project.base_directory == keep:
+            continue
+        total -= project.size()
+        del projects[project.base_directory]
+        evicted.append(project.base_directory)
+    return evicted
+
+
+class CompletionSession(object):
+    # The completions of one view while the user keeps typing in the same
+    # string. The matching state of all entries matching the current word
+    # is kept per index; if the word only grows, just these entries are
+    # continued with the new characters instead of scanning the indexes.
+    # The remembered states are dropped as soon as an index is replaced or
+    # changed.
+
+    def __init__(self, base_directory, limit):
+        self.base_directory = base_directory
+        self.limit = limit
+        self.point = None
+        self.prefix = ''
+        self.search_prefix = False
+        self.indexes = []
+        self.generations = []
+        self.parts = []
+        self.states = []
+        self.narrowed = 0
+        self.scanned = 0
+        self.translation = False
+
+    def follows(self, prefix, point):
+        # True if prefix is the previous prefix plus the characters typed
+        # since, the caller checks that these are in the view
+        return (self.point is not None and point - self.point == len(prefix) - len(self.prefix) > 0
+            and prefix.startswith(self.prefix))
+
+    def isCurrent(self, indexes):
+        if len(indexes) != len(self.indexes):
+            return False
+        for (index, with_search_prefix), known, generation in zip(indexes, self.indexes, self.generations):
+            if index is not known or index.generation != generation:
+                return False
+        return True
+
+    def complete(self, indexes, point, prefix, search_prefix):
+        # indexes are (index, with_search_prefix) pairs
+        current = self.isCurrent(indexes)
+        match_lists = []
+        parts_list = []
+        states_list = []
+        self.narrowed = 0
+        self.scanned = 0
+        for i, (index, with_search_prefix) in enumerate(indexes):
+            lookup = with_search_prefix and search_prefix
+            parts = index.queryParts(prefix, lookup)
+            previous = None
+            if current:
+                cut, head, word = self.parts[i]
+                if parts[0] == cut and parts[1] == head and parts[2].startswith(word):
+                    previous = (word, self.states[i])
+                    self.narrowed += 1
+            states = index.search(prefix, lookup, previous, self.limit)
+            self.scanned += index.scanned
+            match_lists.append(index.matches(prefix, lookup, states, self.limit))
+            parts_list.append(parts)
+            states_list.append(states)
+        self.parts = parts_list
+        self.states = states_list
+        self.indexes = [index for index, with_search_prefix in indexes]
+        self.generations = [index.generation for index in self.indexes]
+        self.point = point
+        self.prefix = prefix
+        self.search_prefix = search_prefix
+        return topMatches(match_lists, self.limit)
+
+
+class BackgroundLoader(object):
+    # Runs slow loaders (php app/console calls, ...) on worker threads.
+    # A load for a key which is already running is merged into the running
+    # one; its callback is called when that load has finished.
+
+    def __init__(self, dispatch):
+        self.dispatch = dispatch
+        self.lock = threading.Lock()
+        self.callbacks = {}
+        self.threads = {}
+
+    def start(self, key, work, on_done=None):
+        self.lock.acquire()
+        try:
+            if key in self.threads:
+                if on_done:
+                    self.callbacks[key].append(on_done)
+                return False
+            self.callbacks[key] = on_done and [on_done] or []
+            # started first, wait() may join it right away; run() only
+            # removes it once the lock is released
+            thread = threading.Thread(target=self.run, args=(key, work))
+            thread.setDaemon(True)
+            thread.start()
+            self.threads[key] = thread
+        finally:
+            self.lock.release()
+        return True
+
+    def run(self, key, work):
+        try:
+            work()
+        finally:
+            self.lock.acquire()
+            try:
+                callbacks = self.callbacks.pop(key)
+                del self.threads[key]
+            finally:
+                self.lock.release()
+            for callback in callbacks:
+                self.dispatch(callback)
+
+    def isLoading(self, key):
+        return key in self.threads
+
+    def wait(self, key, timeout=None):
+        thread = self.threads.get(key)
+        if thread:
+            thread.join(timeout)
+
+
+def percentile(samples, percent):
+    # nearest rank of the sorted samples
+    return samples[max(0, int(round(percent / 100.0 * len(samples))) - 1)]
+
+
+class Stats(object):
+    # Timings and counters per project, shown by the statistics command.
+    # Only the last max_samples timings of a phase are kept for the
+    # percentiles. If log is set every timing is also appended to that file
+    # as a line of JSON.
+
+    def __init__(self, max_samples=1000):
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counters = {}
+        self.log = None
+
+    def record(self, project, phase, seconds):
+        self.lock.acquire()
+        try:
+            phases = self.timings.setdefault(project, {})
+            timing = phases.get(phase)
+            if not timing:
+                timing = phases[phase] = [0, 0.0, []]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2].append(seconds)
+            if len(timing[2]) > self.max_samples:
+                del timing[2][0]
+            if self.log:
+                try:
+                    f = open(self.log, 'a')
+                    try:
+                        f.write(json.dumps({'time': time.time(), 'project': project, 'phase': phase, 'seconds': seconds}) + '\n')
+                    finally:
+                        f.close()
+                except (IOError, OSError):
+                    pass
+        finally:
+            self.lock.release()
+
+    def since(self, project, phase, started):
+        self.record(project, phase, time.time() - started)
+
+    def count(self, project, name, n=1):
+        self.lock.acquire()
+        try:
+            counters = self.counters.setdefault(project, {})
+            counters[name] = counters.get(name, 0) + n
+        finally:
+            self.lock.release()
+
+    def reset(self, project):
+        self.lock.acquire()
+        try:
+            self.timings.pop(project, None)
+            self.counters.pop(project, None)
+        finally:
+            self.lock.release()
+
+    def summary(self, project):
+        self.lock.acquire()
+        try:
+            phases = self.timings.get(project, {})
+            lines = ['%-24s %7s %9s %9s %9s %9s %9s' % ('Phase', 'Calls', 'p50', 'p90', 'p99', 'Max', 'Total')]
+            for phase in sorted(phases):
+                calls, total, samples = phases[phase]
+                samples = sorted(samples)
+                lines.append('%-24s %7d %8.1fms %8.1fms %8.1fms %8.1fms %8.2fs' % (phase, calls,
+                    percentile(samples, 50) * 1000, percentile(samples, 90) * 1000, percentile(samples, 99) * 1000,
+                    samples[-1] * 1000, total))
+            counters = self.counters.get(project, {})
+            if counters:
+                lines.append('')
+                lines.append('%-24s %7s' % ('Counter', 'Count'))
+                for name in sorted(counters):
+                    lines.append('%-24s %7d' % (name, counters[name]))
+            return '\n'.join(lines) + '\n'
+        finally:
+            self.lock.release()
+
+
+stats = Stats()
+
+
+class Indexer(object):
+    # Loads and updates the indexes of the projects. The editor plugin
+    # and the completion daemon both build on it: the settings are set with
+    # applySettings and base_directory is the project to work on. The
+    # projects are shared by all instances.
+
+    base_directory = ''
+    cache_directory = None
+    projects = {}
+    console_workers = {}
+
+    loader = BackgroundLoader(lambda callback: callback())
+
+    def applySettings(self, s):
+        # s is the SymfonyCommander.sublime-settings or a dict of them
+        self.php_command = s.get('php_command')
+        self.persistent_cache = s.get('persistent_cache', True)
+        self.watch_interval = s.get('watch_interval', 5)
+        self.scan_threads = s.get('scan_threads', 4)
+        self.index_source = s.get('index_source', 'auto')
+        self.cache_env = s.get('cache_env', 'dev')
+        self.console_worker = s.get('console_worker', False)
+        self.console_worker_command = s.get('console_worker_command', False)
+        self.console_worker_timeout = s.get('console_worker_timeout', 60)
+        self.completion_limit = s.get('completion_limit', 100)
+        stats.log = s.get('stats_log') or None
+        self.memory_budget = s.get('memory_budget_mb', 100) * 1024 * 1024
+        self.index_vendors = s.get('index_vendors', False)
+        self.vendor_ignore = s.get('vendor_ignore', ['*/Tests', '*/tests', '*/test', '*/doc', '*/docs', '*/.git', '*/node_modules'])
+        self.vendor_max_depth = s.get('vendor_max_depth', 6)
+        self.vendor_scan_seconds = s.get('vendor_scan_seconds', 10)
+        self.index_translations = s.get('index_translations', True)
+
+    def openProject(self, sections=ProjectIndex.sections):
+        # Creates the indexes the first time a project is seen and fills the
+        # given sections from the disk cache in the background. Returns True
+        # for a new project.
+        project = self.projects.get(self.base_directory)
+        if project:
+            project.used = time.time()
+            return False
+        project = self.projects[self.base_directory] = ProjectIndex(self.base_directory)
+        if self.persistent_cache:
+            self.restoreCache(sections)
+        project.watcher = ProjectWatcher(self.base_directory)
+        self.evictProjects()
+        return True
+
+    def cacheDirectory(self):
+        return self.cache_directory
+
+    def project(self, base_directory=None):
+        # The indexes of the project, a project which was dropped in the
+        # meantime gets empty ones
+        base_directory = base_directory or self.base_directory
+        project = self.projects.get(base_directory)
+        if not project:
+            project = ProjectIndex(base_directory)
+        return project
+
+    def evictProjects(self):
+        if self.memory_budget:
+            for base_directory in evictProjects(self.projects, self.memory_budget, self.base_directory):
+                stats.count(base_directory, 'project evicted')
+
+    def restoreCache(self, sections=ProjectIndex.sections):
+        # Fill the indexes of the project from the on disk cache on a worker
+        # thread, every section which changed since it was written is loaded
+        # again later. The completion indexes are only restored if they are
+        # in sections, the API index is read by loadApi at the first search.
+        # Loads started in the meantime wait for it (see waitForRestore).
+        base_directory = self.base_directory
+        project = self.project()
+        cache_path = os.path.join(self.cacheDirectory(), digest(base_directory))
+        index_vendors = self.index_vendors
+        index_translations = self.index_translations
+        vendor_settings = self.vendorSettings()
+
+        def work():
+            started = time.time()
+            try:
+                # the whole cache was one file up to version 2
+                os.remove(cache_path + '.json')
+            except OSError:
+                pass
+            cache = DiskCache(cache_path)
+            self.restoreSections(project, cache, sections, index_vendors, index_translations, vendor_settings)
+            project.disk_cache = cache
+            for section in sections:
+                stats.count(base_directory, getattr(project, section).loaded and 'disk cache hit' or 'disk cache miss')
+            stats.since(base_directory, 'disk cache restore', started)
+            self.evictProjects()
+
+        self.loader.start(('restore', id(project)), work)
+
+    def waitForRestore(self, project):
+        # a project opened again while the restore for its earlier indexes
+        # still runs gets a restore of its own
+        self.loader.wait(('restore', id(project)))
+
+    def restoreSections(self, project, cache, sections, index_vendors, index_translations, vendor_settings):
+        base_directory = project.base_directory
+
+        if 'routes' in sections:
+            data = cache.get('routes', fingerprint(base_directory, 'routes'))
+            if data:
+                project.routes = infoIndex(data['info'], ' [Route]')
+        if 'containers' in sections:
+            data = cache.get('containers', fingerprint(base_directory, 'containers'))
+            if data:
+                project.containers = serviceIndex([(service[0], ServiceDefinition(*service[1:])) for service in data['services']])
+        if 'entities' in sections:
+            data = cache.get('entities', fingerprint(base_directory, 'entities', self.index_vendors))
+            if data:
+                project.entities = CompletionIndex(data['names'], ' [Entity]')
+                self.addCommonSnippets(data['bundles'], project)
+        if 'templates' in sections:
+            data = cache.get('templates', fingerprint(base_directory, 'templates', self.index_vendors))
+            if data:
+                project.templates = CompletionIndex(data['names'], ' [Tpl]')
+                self.addCommonSnippets(data['bundles'], project)
+        if index_vendors and sections:
+            data = cache.get('vendors', vendor_settings)
+            if data:
+                project.vendors = data['packages']
+        if index_translations and sections:
+            # every catalog is cached with its mtime and size, the index is
+            # only used as it is if none of them changed
+            data = cache.get('translations', '')
+            if data:
+                project.translations = TranslationIndex(data['files'],
+                    filesCurrent(data['files'], fileStates(base_directory, translationFiles(base_directory))))
+        if sections:
+            data = cache.get('fields', '')
+            if data:
+                project.fields = EntityFieldIndex(data['files'],
+                    filesCurrent(data['files'], fileStates(base_directory, entityFiles(base_directory))))
+
+    def storeCache(self, base_directory, section, section_fingerprint, data):
+        cache = self.project(base_directory).disk_cache
+        if cache:
+            cache.put(section, section_fingerprint, data)
+
+    def updateFile(self, path):
+        # Brings the index up to date after a file of the project has changed:
+        # entities and templates are updated entry by entry, routes and
+        # services are reloaded as a whole
+        base_directory = self.base_directory
+        project = self.project()
+        controller = controllerOf(base_directory, path)
+        if controller and project.navigation.loaded:
+            if os.path.isfile(path):
+                project.navigation.setController(path, parseController(path, controller[0], controller[1]))
+            else:
+                project.navigation.removeController(path)
+        section, names = classifyFile(base_directory, path)
+        if section == 'entities' and project.fields.loaded:
+            project.fields.setFile(projectPath(base_directory, path), parseEntityFile(path))
+            self.storeCache(base_directory, 'fields', '', {'files': dict(project.fields.files)})
+        if section in ('entities', 'templates'):
+            index = getattr(project, section)
+            if not index.loaded:
+                return
+            changed = False
+            if os.path.isfile(path):
+                for name in names:
+                    changed = index.add(name) or changed
+            else:
+                for name in names:
+                    if section == 'entities' and ':' not in name:
+                        # the short name may still be used by another bundle
+                        if len([other for other in index if other.endswith(':' + name)]) > 1:
+                            continue
+                    changed = index.remove(name) or changed
+            if changed:
+                # the fingerprint walks the template directories, the
+                # writer thread of the disk cache computes it
+                bundles = project.common_snippets.names
+                index_vendors = self.index_vendors
+                self.storeCache(base_directory, section, lambda: fingerprint(base_directory, section, index_vendors),
+                    {'names': list(index.names), 'bundles': bundles})
+        elif section == 'translations':
+            index = project.translations
+            if index.loaded:
+                index.setFile(names[0], parseCatalog(path))
+                self.storeCache(base_directory, 'translations', '', {'files': dict(index.files)})
+        elif section == 'routes' and project.routes.loaded:
+            self.loadRoutes(True)
+        elif section == 'containers' and project.containers.loaded:
+            self.loadContainer(True)
+        elif section == 'sources':
+            if project.entities.loaded or project.templates.loaded:
+                self.loadSources(True)
+            if project.navigation.loaded:
+                self.loadNavigation(True)
+
+    def consoleCommand(self, command):
+        # CMD:
+        if not self.php_command:
+            return "php app/console --no-ansi " + command
+        else:
+            return self.php_command + " app/console --no-ansi " + command
+
+    def consoleOutput(self, base_directory, command, job=None):
+        # Output of a console command, may be called from a background thread.
+        # If the command runs for a job which was cancelled, the worker was
+        # stopped on purpose and the command is not run again.
+        output, errors, status = self.consoleResult(base_directory, command, job)
+        return output + errors
+
+    def consoleResult(self, base_directory, command, job=None):
+        # stdout, stderr and the exit status of a console command, the
+        # console worker has both in stdout
+        started = time.time()
+        if self.console_worker and workerCanRun(command, self.cache_env):
+            result = self.consoleWorker(base_directory).execute(command)
+            if result is not None:
+                stats.since(base_directory, 'console (worker)', started)
+                return result[0], '', result[1]
+            if job and job.cancelled:
+                return '', '', 0
+        self.stopConsoleWorker(base_directory, command)
+        result = runCommand(self.consoleCommand(command), base_directory)
+        stats.since(base_directory, 'console (process)', started)
+        return result
+
+    def reportError(self, base_directory, message):
+        # A load which failed, the plugin shows it in the status bar as well
+        stats.count(base_directory, 'load errors')
+        sys.stderr.write('SymfonyCommander: %s\n' % message)
+
+    def loadFailed(self, section, force):
+        # A section whose console command failed is not tried again on every
+        # completion, only after CONSOLE_RETRY_SECONDS or when forced
+        failed = self.project().failed.get(section)
+        if force or not failed or time.time() - failed > CONSOLE_RETRY_SECONDS:
+            return False
+        stats.count(self.base_directory, section + ' failed')
+        return True
+
+    def consoleWorker(self, base_directory):
+        worker = self.console_workers.get(base_directory)
+        if worker:
+            worker.timeout = self.console_worker_timeout
+            return worker
+        if self.console_worker_command:
+            command = self.console_worker_command
+        else:
+            script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'console-worker.php')
+            command = '%s "%s" "%s" %s' % (self.php_command or 'php', script, base_directory, self.cache_env)
+        worker = ConsoleWorker(command, base_directory, self.console_worker_timeout)
+        self.console_workers[base_directory] = worker
+        return worker
+
+    def stopConsoleWorker(self, base_directory, command):
+        # A booted kernel is of no use anymore once the cache was rebuilt
+        worker = self.console_workers.get(base_directory)
+        if worker and command.startswith('cache:'):
+            worker.stop()
+
+    # Routes and services are loaded in the background, until the load has
+    # finished the completions just work with what is already there.
+    # If possible they are read from the files Symfony compiled into its
+    # cache directory, the console is only called if those are missing or
+    # outdated.
+    def loadRoutes(self, force=False, on_done=None):
+        if not self.base_directory:
+            return
+        project = self.project()
+        if not force and project.routes.loaded:
+            stats.count(self.base_directory, 'routes hit')
+            if on_done:
+                on_done()
+            return
+        if self.loadFailed('routes', force):
+            if on_done:
+                on_done()
+            return
+        stats.count(self.base_directory, 'routes miss')
+        base_directory = self.base_directory
+        index_source = self.index_source
+        cache_env = self.cache_env
+
+        def work():
+            # the disk cache may have had it
+            self.waitForRestore(project)
+            if not force and project.routes.loaded:
+                return
+            routes_fingerprint = fingerprint(base_directory, 'routes')
+            started = time.time()
+            # routes of @Route annotations are only in the url generator
+            # once the cache was built after the controller changed
+            generator = index_source == 'auto' and compiledFile(base_directory, cache_env, 'UrlGenerator.php',
+                controllerFiles(base_directory))
+            if generator:
+                routes, route_info = parseUrlGenerator(generator)
+                stats.since(base_directory, 'routes (compiled)', started)
+            else:
+                output, errors, status = self.consoleResult(base_directory, 'router:debug')
+                error = commandError(output, errors, status)
+                if error:
+                    # stays unloaded, the disk cache keeps what it had
+                    project.failed['routes'] = time.time()
+                    self.reportError(base_directory, 'router:debug failed: ' + error)
+                    return
+                started = time.time()
+                routes, route_info = parseDebugOutput(output, '[router]')
+                stats.since(base_directory, 'routes (parse)', started)
+            project.failed.pop('routes', None)
+            project.routes = infoIndex(route_info, ' [Route]')
+            self.storeCache(base_directory, 'routes', routes_fingerprint, {'info': route_info})
+            self.evictProjects()
+
+        self.loader.start(('routes', base_directory), work, on_done)
+
+    def loadContainer(self, force=False, on_done=None):
+        if not self.base_directory:
+            return
+        project = self.project()
+        if not force and project.containers.loaded:
+            stats.count(self.base_directory, 'containers hit')
+            if on_done:
+                on_done()
+            return
+        if self.loadFailed('containers', force):
+            if on_done:
+                on_done()
+            return
+        stats.count(self.base_directory, 'containers miss')
+        base_directory = self.base_directory
+        index_source = self.index_source
+        cache_env = self.cache_env
+
+        def work():
+            # the disk cache may have had it
+            self.waitForRestore(project)
+            if not force and project.containers.loaded:
+                return
+            containers_fingerprint = fingerprint(base_directory, 'containers')
+            started = time.time()
+            dump = index_source == 'auto' and compiledFile(base_directory, cache_env, 'ProjectContainer.xml')
+            services = None
+            if dump:
+                services = parseContainerXml(dump)
+                stats.since(base_directory, 'containers (compiled)', started)
+            else:
+                # Symfony 2.4+ describes the container in XML, older
+                # versions fail on --format and only know the text table
+                output, errors, status = self.consoleResult(base_directory, 'container:debug --format=xml')
+                started = time.time()
+                if status == 0 and output.lstrip().startswith('<'):
+                    try:
+                        services = parseContainerXml(xmlSource(output))
+                    except SyntaxError:
+                        pass
+                if services is None:
+                    output, errors, status = self.consoleResult(base_directory, 'container:debug')
+                    error = commandError(output, errors, status)
+                    if error:
+                        # stays unloaded, the disk cache keeps what it had
+                        project.failed['containers'] = time.time()
+                        self.reportError(base_directory, 'container:debug failed: ' + error)
+                        return
+                    started = time.time()
+                    services = parseContainerDebug(output)
+                stats.since(base_directory, 'containers (parse)', started)
+            project.failed.pop('containers', None)
+            project.containers = serviceIndex(services)
+            self.storeCache(base_directory, 'containers', containers_fingerprint,
+                {'services': [[name] + service.dump() for name, service in services]})
+            self.evictProjects()
+
+        self.loader.start(('containers', base_directory), work, on_done)
+
+    def loadSources(self, force=False, on_done=None):
+        # Entities, templates and bundle prefixes are collected in a single
+        # background scan of src/, and of vendor/ with index_vendors
+        if not self.base_directory:
+            return
+        base_directory = self.base_directory
+        project = self.project()
+        if not force and project.entities.loaded and project.templates.loaded:
+            stats.count(base_directory, 'sources hit')
+            if on_done:
+                on_done()
+            return
+        stats.count(base_directory, 'sources miss')
+        workers = self.scan_threads
+        index_vendors = self.index_vendors
+        vendor_settings = self.vendorSettings()
+        vendor_ignore = self.vendor_ignore
+        vendor_max_depth = self.vendor_max_depth
+        vendor_scan_seconds = self.vendor_scan_seconds
+
+        def work():
+            # the disk cache may have had it
+            self.waitForRestore(project)
+            if not force and project.entities.loaded and project.templates.loaded:
+                return
+            entities_fingerprint = fingerprint(base_directory, 'entities', index_vendors)
+            templates_fingerprint = fingerprint(base_directory, 'templates', index_vendors)
+            started = time.time()
+            entities, templates, bundle_prefixes = scanSources(base_directory, workers)
+            stats.since(base_directory, 'sources (scan)', started)
+            if index_vendors:
+                started = time.time()
+                vendor_entities, vendor_templates, vendor_bundles, packages, scanned = scanVendors(base_directory,
+                    project.vendors or {}, vendor_ignore, vendor_max_depth, vendor_scan_seconds, workers)
+                stats.since(base_directory, 'vendors (scan)', started)
+                stats.count(base_directory, 'vendor packages scanned', scanned)
+                entities.extend(vendor_entities)
+                templates.extend(vendor_templates)
+                bundle_prefixes.extend(vendor_bundles)
+                project.vendors = packages
+                self.storeCache(base_directory, 'vendors', vendor_settings, {'packages': packages})
+            project.entities = CompletionIndex(entities, ' [Entity]')
+            project.templates = CompletionIndex(templates, ' [Tpl]')
+            project.common_snippets = CompletionIndex(bundle_prefixes)
+            self.storeCache(base_directory, 'entities', entities_fingerprint, {'names': entities, 'bundles': bundle_prefixes})
+            self.storeCache(base_directory, 'templates', templates_fingerprint, {'names': templates, 'bundles': bundle_prefixes})
+            self.evictProjects()
+
+        self.loader.start(('sources', base_directory), work, on_done)
+
+    def loadTranslations(self, force=False, on_done=None):
+        # Collects the keys of the message catalogs of the project, only the
+        # catalogs which changed since they were cached are parsed
+        if not self.base_directory or not self.index_translations:
+            return
+        base_directory = self.base_directory
+        project = self.project()
+        if not force and project.translations.loaded:
+            stats.count(base_directory, 'translations hit')
+            if on_done:
+                on_done()
+            return
+        stats.count(base_directory, 'translations miss')
+        workers = self.scan_threads
+
+        def work():
+            # the disk cache may have had it
+            self.waitForRestore(project)
+            if not force and project.translations.loaded:
+                return
+            started = time.time()
+            files, parsed = scanTranslations(base_directory, project.translations.files, workers)
+            stats.since(base_directory, 'translations (scan)', started)
+            stats.count(base_directory, 'catalogs parsed', parsed)
+            project.translations = TranslationIndex(files)
+            self.storeCache(base_directory, 'translations', '', {'files': files})
+            self.evictProjects()
+
+        self.loader.start(('translations', base_directory), work, on_done)
+
+    def loadEntityFields(self, force=False, on_done=None):
+        # Parses the mapping annotations of the entities, only the files
+        # which changed since they were cached are parsed
+        if not self.base_directory:
+            return
+        base_directory = self.base_directory
+        project = self.project()
+        if not force and project.fields.loaded:
+            stats.count(base_directory, 'fields hit')
+            if on_done:
+                on_done()
+            return
+        stats.count(base_directory, 'fields miss')
+        workers = self.scan_threads
+
+        def work():
+            # the disk cache may have had it
+            self.waitForRestore(project)
+            if not force and project.fields.loaded:
+                return
+            started = time.time()
+            files, parsed = scanEntityFields(base_directory, project.fields.files, workers)
+            stats.since(base_directory, 'fields (scan)', started)
+            stats.count(base_directory, 'entities parsed', parsed)
+            project.fields = EntityFieldIndex(files)
+            self.storeCache(base_directory, 'fields', '', {'files': files})
+            self.evictProjects()
+
+        self.loader.start(('fields', base_directory), work, on_done)
+
+    def vendorSettings(self):
+        # fingerprint of the settings the vendor scan depends on
+        return digest(json.dumps([self.vendor_ignore, self.vendor_max_depth]))
+
+    def loadNavigation(self, force=False, on_done=None):
+        # Parses all controllers below src/ for the templates their actions
+        # render
+        if not self.base_directory:
+            return
+        base_directory = self.base_directory
+        project = self.project()
+        if not force and project.navigation.loaded:
+            if on_done:
+                on_done()
+            return
+        workers = self.scan_threads
+
+        def work():
+            started = time.time()
+            bundles = {}
+            for bundle_dir in bundleDirectories(base_directory):
+                parts = bundle_dir.split('/')
+                bundles[parts[-2] + parts[-1]] = bundle_dir
+            navigation = NavigationIndex(base_directory, bundles)
+            for controllers in parallelMap(scanControllers, [(bundle_dir, prefix) for prefix, bundle_dir in bundles.items()], workers):
+                for path, actions in controllers:
+                    navigation.setController(path, actions)
+            project.navigation = navigation
+            stats.since(base_directory, 'controllers (scan)', started)
+
+        self.loader.start(('navigation', base_directory), work, on_done)
+
+    def loadApi(self, force=False, on_done=None):
+        # Indexes the classes, methods and constants below vendor/symfony
+        # for the API search. The index has its own section in the disk
+        # cache, which is only read here and not when the project is opened.
+        if not self.base_directory:
+            return
+        base_directory = self.base_directory
+        project = self.project()
+        if not force and project.api.loaded:
+            stats.count(base_directory, 'api hit')
+            if on_done:
+                on_done()
+            return
+        stats.count(base_directory, 'api miss')
+        workers = self.scan_threads
+
+        def work():
+            # the disk cache may have had it
+            self.waitForRestore(project)
+            if not force and project.api.loaded:
+                return
+            api_fingerprint = fingerprint(base_directory, 'api')
+            data = project.disk_cache and project.disk_cache.get('api', api_fingerprint)
+            if data and not force:
+                project.api = ApiIndex(data['symbols'])
+                stats.count(base_directory, 'api disk cache hit')
+            else:
+                started = time.time()
+                symbols = scanApi(base_directory, workers)
+                stats.since(base_directory, 'api (scan)', started)
+                project.api = ApiIndex(symbols)
+                self.storeCache(base_directory, 'api', api_fingerprint, {'symbols': symbols})
+            self.evictProjects()
+
+        self.loader.start(('api', base_directory), work, on_done)
+
+    def addCommonSnippets(self, snippets, project):
+        project.common_snippets = CompletionIndex(project.common_snippets.names + snippets)
+
+    def clearCache(self):
+        project = self.project()
+        project.clear()
+        if project.disk_cache:
+            project.disk_cache.clear()
+
+    def completionIndexes(self, base_directory, translation=False):
+        # (index, with_search_prefix) pairs the completions come from, the
+        # translation keys only for a translation (see isTranslationContext)
+        project = self.project(base_directory)
+        indexes = [(project.common_snippets, False)]
+        for section in ProjectIndex.sections:
+            indexes.append((getattr(project, section), True))
+        if translation and self.index_translations:
+            indexes.append((project.translations, True))
+        return indexes
+
+    def fieldCompletions(self, base_directory, context, file_name, search_prefix):
+        # Fields of the entity a DQL alias or a findBy criteria stands for,
+        # context is the code in front of the cursor
+        query = entityFieldQuery(context, search_prefix or '')
+        if not query:
+            return []
+        fields = self.project(base_directory).fields
+        if not fields.loaded:
+            if base_directory == self.base_directory:
+                self.loadEntityFields()
+            return []
+        entity, associations, word = query
+        path = fields.resolve(entity or repositoryEntity(base_directory, file_name))
+        for association in associations:
+            path = path and fields.target(path, association)
+        if path:
+            index = fields.index(path)
+        elif not entity and not associations:
+            # a repository we know nothing about
+            index = fields.index()
+        else:
+            return []
+        return index.completions(word, False, self.completion_limit)
+
+    def complete(self, session, indexes, point, prefix, search_prefix, started, context=None, file_name=None):
+        # context is the code in front of the cursor for the entity fields
+        snippets = session.complete(indexes, point, prefix, search_prefix)
+        base_directory = session.base_directory
+        if context:
+            snippets = self.fieldCompletions(base_directory, context, file_name, search_prefix) + snippets
+        stats.count(base_directory, 'completions scanned', session.scanned)
+        stats.count(base_directory, 'completions narrowed', session.narrowed)
+        stats.count(base_directory, 'completions returned', len(snippets))
+        stats.since(base_directory, 'completions', started)
+        return snippets
+
+
+# The settings applySettings reads. The editor sends DAEMON_SETTINGS with
+# every request to the completion daemon. The others end up in a command
+# line or name a file to write, the daemon only takes them from its config
+# file (see writeDaemonConfig), together with the cache directory.
+INDEX_SETTINGS = ('php_command', 'persistent_cache', 'watch_interval', 'scan_threads', 'index_source', 'cache_env',
+    'console_worker', 'console_worker_command', 'console_worker_timeout', 'completion_limit', 'stats_log', 'memory_budget_mb',
+    'index_vendors', 'vendor_ignore', 'vendor_max_depth', 'vendor_scan_seconds', 'index_translations')
+DAEMON_SETTINGS = ('persistent_cache', 'watch_interval', 'scan_threads', 'index_source', 'console_worker_timeout',
+    'completion_limit', 'memory_budget_mb', 'index_vendors', 'vendor_ignore', 'vendor_max_depth', 'vendor_scan_seconds',
+    'index_translations')
+DAEMON_CONFIG_SETTINGS = ('php_command', 'cache_env', 'console_worker', 'console_worker_command', 'stats_log')
+
+# Bump this whenever the requests or answers of the daemon change, an older
+# daemon is then stopped and a new one started
+DAEMON_VERSION = 5
+DAEMON_MAX_SESSIONS = 1000
+DAEMON_MAX_REQUEST = 1024 * 1024
+
+
+def indexSettings(s, keys=INDEX_SETTINGS):
+    settings = {}
+    for key in keys:
+        if s.get(key) is not None:
+            settings[key] = s.get(key)
+    return settings
+
+
+def readDaemonConfig(path):
+    # The token and the trusted settings of the completion daemon, None if
+    # the file is missing, broken or readable by other users
+    try:
+        if os.name != 'nt' and os.stat(path).st_mode & 0o077:
+            return None
+        f = open(path)
+        try:
+            config = json.load(f)
+        finally:
+            f.close()
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(config, dict) or not config.get('token'):
+        return None
+    return config
+
+
+def writeDaemonConfig(path, settings, cache_directory):
+    # Writes the config file of the completion daemon, readable by the user
+    # only, and returns the token every request has to carry. The token is
+    # made when the file is written the first time.
+    config = readDaemonConfig(path)
+    token = config and config['token'] or binascii.hexlify(os.urandom(16)).decode('ascii')
+    values = {'token': token, 'settings': indexSettings(settings, DAEMON_CONFIG_SETTINGS), 'cache_directory': cache_directory}
+    if values != config:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        f = os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w')
+        try:
+            # os.open only sets the mode of a new file
+            if os.name != 'nt':
+                os.chmod(path, 0o600)
+            json.dump(values, f)
+        finally:
+            f.close()
+    return token
+
+
+class CompletionDaemon(object):
+    # State of the completion daemon: the indexes of all projects (shared
+    # by all clients through Indexer.projects), the completion sessions of
+    # the views of the clients and the settings each project was last used
+    # with, which the watcher needs. Without a request for idle seconds the
+    # daemon stops. Only requests with the token of the config file at
+    # config_path are answered.
+
+    def __init__(self, idle=0, config_path=None):
+        self.idle = idle
+        self.used = time.time()
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.settings = {}
+        self.polled = {}
+        self.project_locks = {}
+        self.server = None
+        self.config_path = config_path
+        self.config = {}
+        self.config_mtime = None
+
+    def loadConfig(self):
+        # The config file is read again after the editor changed it, a
+        # half written one at the next request
+        self.lock.acquire()
+        try:
+            modified = self.config_path and mtime(self.config_path)
+            if modified and modified != self.config_mtime:
+                config = readDaemonConfig(self.config_path)
+                if config:
+                    self.config = config
+                    self.config_mtime = modified
+            return self.config
+        finally:
+            self.lock.release()
+
+    def projectLock(self, base_directory):
+        # Searches, updates and the watcher of a project take turns: updates
+        # change the indexes in place and a search builds the lookup tables
+        # of an index at its first use (see CompletionIndex.buildStarts)
+        self.lock.acquire()
+        try:
+            lock = self.project_locks.get(base_directory)
+            if not lock:
+                lock = self.project_locks[base_directory] = threading.Lock()
+            return lock
+        finally:
+            self.lock.release()
+
+    def authorized(self, request):
+        token = self.loadConfig().get('token')
+        return bool(token) and request.get('token') == token
+
+    def indexer(self, params):
+        config = self.loadConfig()
+        settings = indexSettings(params.get('settings') or {}, DAEMON_SETTINGS)
+        settings.update(config.get('settings') or {})
+        indexer = Indexer()
+        indexer.applySettings(settings)
+        indexer.cache_directory = config.get('cache_directory')
+        if not indexer.cache_directory:
+            indexer.persistent_cache = False
+        base_directory = params.get('base_directory') or ''
+        if not os.path.isdir(base_directory):
+            raise ValueError('not a directory: %r' % base_directory)
+        indexer.base_directory = base_directory
+        self.settings[base_directory] = params
+        if indexer.openProject():
+            # changes from now on are picked up by watch(), not only after
+            # its first round
+            indexer.project().watcher.snapshot()
+        return indexer
+
+    def answer(self, method, params):
+        self.used = time.time()
+        if method == 'ping':
+            return {'version': DAEMON_VERSION, 'pid': os.getpid()}
+        if method == 'shutdown':
+            self.stop()
+            return True
+        if method == 'close':
+            self.sessions.pop(params.get('session'), None)
+            return True
+        indexer = self.indexer(params)
+        if method == 'complete':
+            return self.complete(indexer, params)
+        if method == 'lookup':
+            return self.lookup(indexer, params)
+        if method == 'update':
+            watcher = indexer.project().watcher
+            if watcher:
+                watcher.mark(params['path'])
+            lock = self.projectLock(indexer.base_directory)
+            lock.acquire()
+            try:
+                indexer.updateFile(params['path'])
+            finally:
+                lock.release()
+            return True
+        if method == 'clear':
+            indexer.clearCache()
+            return True
+        if method == 'stats':
+            return stats.summary(indexer.base_directory)
+        raise ValueError('unknown method %r' % method)
+
+    def complete(self, indexer, params):
+        started = time.time()
+        indexer.loadRoutes()
+        indexer.loadContainer()
+        indexer.loadSources()
+        translation = params.get('translation', False)
+        if translation:
+            indexer.loadTranslations()
+        key = params.get('session')
+        self.lock.acquire()
+        try:
+            session = self.sessions.get(key)
+            if not session or session.base_directory != indexer.base_directory:
+                if len(self.sessions) >= DAEMON_MAX_SESSIONS:
+                    self.sessions.clear()
+                session = self.sessions[key] = CompletionSession(indexer.base_directory, indexer.completion_limit)
+        finally:
+            self.lock.release()
+        session.limit = indexer.completion_limit
+        indexes = indexer.completionIndexes(indexer.base_directory, translation)
+        lock = self.projectLock(indexer.base_directory)
+        lock.acquire()
+        try:
+            return indexer.complete(session, indexes, params['point'], params['prefix'], params.get('search_prefix'), started,
+                params.get('context'), params.get('file_name'))
+        finally:
+            lock.release()
+
+    def lookup(self, indexer, params):
+        # Entries of the routes or services for the quick panels, waits
+        # until they are loaded
+        section = params.get('section')
+        done = threading.Event()
+        if section == 'routes':
+            indexer.loadRoutes(on_done=done.set)
+        elif section == 'containers':
+            indexer.loadContainer(on_done=done.set)
+        else:
+            raise ValueError('unknown section %r' % section)
+        done.wait(params.get('timeout') or 300)
+        index = getattr(indexer.project(), section)
+        if section == 'containers':
+            return [[name] + service.dump() for name, service in zip(index.names, index.details or ())]
+        return index.info()
+
+    def watch(self):
+        # Polls the watchers of all projects, and stops the daemon when it
+        # was not used for idle seconds
+        while True:
+            time.sleep(1)
+            if self.idle and time.time() - self.used > self.idle:
+                self.stop()
+                return
+            for base_directory, project in list(Indexer.projects.items()):
+                params = self.settings.get(base_directory)
+                interval = params and (params.get('settings') or {}).get('watch_interval', 5)
+                if not interval or not project.watcher or time.time() - self.polled.get(base_directory, 0) < interval:
+                    continue
+                self.polled[base_directory] = time.time()
+                try:
+                    indexer = self.indexer(params)
+                except ValueError:
+                    # the project is gone
+                    continue
+                changes = project.watcher.poll()
+                lock = self.projectLock(base_directory)
+                lock.acquire()
+                try:
+                    for path in changes:
+                        indexer.updateFile(path)
+                finally:
+                    lock.release()
+
+    def stop(self):
+        if self.server:
+            # shutdown() waits for serve_forever, which may be this thread
+            thread = threading.Thread(target=self.server.shutdown)
+            thread.setDaemon(True)
+            thread.start()
+
+
+class DaemonHandler(SocketServer.StreamRequestHandler):
+    # One client connection: a JSON request per line, answered by a JSON
+    # line with the same id and either result or error. Anything else, like
+    # the HTTP request a web page can make the browser send, or a request
+    # without the token closes the connection unanswered.
+
+    def handle(self):
+        completion = self.server.completion
+        while True:
+            try:
+                line = self.rfile.readline(DAEMON_MAX_REQUEST)
+            except socket.error:
+                return
+            if not line:
+                return
+            try:
+                request = json.loads(line.decode('utf-8'))
+            except ValueError:
+                return
+            if not isinstance(request, dict) or not completion.authorized(request):
+                return
+            request_id = request.get('id')
+            try:
+                response = {'id': request_id, 'result': completion.answer(request.get('method'), request.get('params') or {})}
+            except Exception:
+                response = {'id': request_id, 'error': str(sys.exc_info()[1])}
+            try:
+                self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+                self.wfile.flush()
+            except socket.error:
+                return
+
+
+class DaemonServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    # on Windows this would let a second daemon take over the port
+    allow_reuse_address = os.name != 'nt'
+
+
+def serveDaemon(port, config_path, idle=0):
+    # Runs the completion daemon on localhost until it is shut down
+    completion = CompletionDaemon(idle, config_path)
+    server = DaemonServer(('127.0.0.1', port), DaemonHandler)
+    server.completion = completion
+    completion.server = server
+    watcher = threading.Thread(target=completion.watch)
+    watcher.setDaemon(True)
+    watcher.start()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class DaemonClient(object):
+    # Connection of an editor to the completion daemon. A request which
+    # fails or takes longer than its timeout returns None and the caller does
+    # the work itself, the daemon is then left alone for a few seconds. If
+    # nothing listens on the port, the daemon is started with command
+    # (a python executable). Connections are kept open for the next request.
+    # configure writes the config file at config_path the daemon reads.
+
+    retry_delay = 3
+    start_delay = 10
+
+    def __init__(self, port, config_path, command='python', idle=3600):
+        self.port = port
+        self.config_path = config_path
+        self.command = command
+        self.idle = idle
+        self.token = None
+        self.config = None
+        self.lock = threading.Lock()
+        self.sockets = []
+        self.retry = 0
+        self.started = 0
+        self.requests = 0
+
+    def configure(self, settings, cache_directory):
+        config = (indexSettings(settings, DAEMON_CONFIG_SETTINGS), cache_directory)
+        if config != self.config:
+            self.token = writeDaemonConfig(self.config_path, settings, cache_directory)
+            self.config = config
+
+    def request(self, method, params, timeout, start=True):
+        # Without start a daemon which is not running is not started
+        if time.time() < self.retry or not self.token:
+            return None
+        sock = self.connect(start)
+        if not sock:
+            return None
+        try:
+            response = self.exchange(sock, method, params, timeout)
+        except (socket.error, ValueError):
+            sock.close()
+            self.retry = time.time() + self.retry_delay
+            return None
+        self.lock.acquire()
+        self.sockets.append(sock)
+        self.lock.release()
+        if 'error' in response:
+            return None
+        return response.get('result')
+
+    def notify(self, method, params, timeout, start=True):
+        # request() on a worker thread, for requests whose answer is not
+        # needed
+        thread = threading.Thread(target=self.request, args=(method, params, timeout, start))
+        thread.setDaemon(True)
+        thread.start()
+
+    def exchange(self, sock, method, params, timeout):
+        self.requests += 1
+        sock.settimeout(timeout)
+        request = {'id': self.requests, 'token': self.token, 'method': method, 'params': params}
+        sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        chunks = []
+        while not chunks or not chunks[-1].endswith(b'\n'):
+            chunk = sock.recv(65536)
+            if not chunk:
+                raise socket.error('connection closed')
+            chunks.append(chunk)
+        return json.loads(b''.join(chunks).decode('utf-8'))
+
+    def connect(self, start=True):
+        self.lock.acquire()
+        try:
+            if self.sockets:
+                return self.sockets.pop()
+        finally:
+            self.lock.release()
+        try:
+            sock = socket.create_connection(('127.0.0.1', self.port), 1)
+        except socket.error:
+            if start:
+                self.start()
+                self.retry = time.time() + 1
+            return None
+        try:
+            version = self.exchange(sock, 'ping', {}, 1).get('result', {}).get('version')
+            if version != DAEMON_VERSION:
+                # a daemon of another version of the plugin
+                self.exchange(sock, 'shutdown', {}, 1)
+                raise socket.error('daemon version %r' % version)
+        except (socket.error, ValueError, AttributeError):
+            sock.close()
+            self.retry = time.time() + self.retry_delay
+            return None
+        return sock
+
+    def start(self):
+        if time.time() - self.started < self.start_delay:
+            return
+        self.started = time.time()
+        script = os.path.abspath(__file__)
+        if script.endswith('.pyc'):
+            script = script[:-1]
+        command = '%s "%s" --port %d --idle %d --config "%s"' % (self.command, script, self.port, self.idle, self.config_path)
+        devnull = open(os.devnull, 'w')
+        try:
+            subprocess.Popen(command, shell=True, stdin=subprocess.PIPE, stdout=devnull, stderr=devnull,
+                cwd=os.path.dirname(script), close_fds=os.name != 'nt')
+        except OSError:
+            pass
+        devnull.close()
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser(usage='%prog [options]', description='Completion daemon of SymfonyCommander: keeps the indexes '
+        'of the Symfony projects and answers the completion requests of any number of editors on localhost.')
+    parser.add_option('--port', type='int', default=48723, help='TCP port on 127.0.0.1 (default: %default)')
+    parser.add_option('--idle', type='int', default=3600, help='stop after this many seconds without a request, 0 never (default: %default)')
+    parser.add_option('--config', help='config file with the token and the settings which run programs, written by the editor')
+    options, args = parser.parse_args()
+    if not options.config:
+        parser.error('--config is required')
+    serveDaemon(options.port, options.config, options.idle)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# Checks the parts of SymfonyCommander which work in the background, like the
+# console worker and the file watcher, on a small generated project outside
+# of Sublime Text:
+#
+#   python benchmark/check.py
+#
+# Every check prints its name, the first failing one stops with a traceback.
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARK_DIR, 'stubs'), os.path.dirname(BENCHMARK_DIR)]
+
+import sublime
+import SymfonyCommander
+from SymfonyCommander import SymfonyCommanderBase
+from SymfonyCommanderCore import Indexer, ConsoleJob, CompletionIndex, CompletionSession, topMatches
+from generate import generateProject
+from run import View, command, finish, reset
+
+
+def indexer(base_directory, settings):
+    indexer = Indexer()
+    values = {'php_command': '"%s"' % sys.executable, 'persistent_cache': False, 'watch_interval': 0, 'console_worker': True,
+        'console_worker_command': '"%s" "%s" "%s"' % (sys.executable, os.path.join(BENCHMARK_DIR, 'fake_worker.py'), base_directory)}
+    values.update(settings)
+    indexer.applySettings(values)
+    indexer.base_directory = base_directory
+    return indexer
+
+
+def checkWorker(base_directory):
+    plugin = indexer(base_directory, {'console_worker_timeout': 1})
+    worker = plugin.consoleWorker(base_directory)
+    expected = plugin.consoleOutput(base_directory, 'router:debug')
+    assert expected.startswith('[router] Current routes'), expected[:100]
+    assert worker.isRunning()
+    process = worker.process
+    assert plugin.consoleOutput(base_directory, 'router:debug') == expected
+    assert worker.process is process, 'the worker was restarted'
+
+    # a command which prints nothing is killed after the timeout
+    started = time.time()
+    assert worker.run('sleep 30') is None
+    assert time.time() - started < 5, 'the hanging worker was not killed'
+    assert not worker.isRunning()
+    assert plugin.consoleOutput(base_directory, 'router:debug') == expected
+    assert worker.isRunning()
+
+
+def checkWorkerCancel(base_directory):
+    plugin = indexer(base_directory, {'console_worker_timeout': 0})
+    job = ConsoleJob(plugin.consoleCommand('sleep 30'), base_directory, title='sleep 30')
+    job.function = lambda: plugin.consoleOutput(base_directory, 'sleep 30', job)
+    job.stopper = plugin.consoleWorker(base_directory).stop
+    job.start()
+    time.sleep(0.5)
+    started = time.time()
+    job.cancel()
+    while job.finished is None and time.time() - started < 5:
+        time.sleep(0.01)
+    assert job.finished is not None, 'the cancelled job is still running'
+    assert job.cancelled
+    assert job.takeOutput() == ''
+
+
+def checkConsoleFailure(base_directory):
+    # a failing console leaves the routes unloaded until it works again
+    plugin = indexer(base_directory, {'php_command': 'echo broken >&2; exit 255;', 'index_source': 'console',
+        'console_worker': False})
+    plugin.projects = {}
+    plugin.openProject()
+    finish(plugin.loadRoutes, True)
+    project = plugin.project()
+    assert not project.routes.loaded, 'the failed load counts as loaded'
+    assert 'routes' in project.failed
+    plugin.php_command = '"%s"' % sys.executable
+    finish(plugin.loadRoutes, True)
+    assert project.routes.loaded and project.routes.names and not project.failed
+
+
+def poll():
+    # one poll of the watchers, and the loads it started
+    SymfonyCommander.pollWatchers()
+    loader = SymfonyCommanderBase.loader
+    loader.wait('watchers')
+    for key in list(loader.threads):
+        loader.wait(key)
+
+
+def checkWatcher(base_directory):
+    # a template created or deleted outside of the editor is found by the
+    # next poll and written to the disk cache
+    reset()
+    sublime.settings.update({'persistent_cache': True, 'watch_interval': 1, 'console_worker': False})
+    plugin = command(View(os.path.join(base_directory, 'src', 'Vendor0', 'Module0Bundle', 'Entity', 'Entity0.php')))
+    plugin.waitForRestore(plugin.project())
+    finish(plugin.loadSources, True)
+    project = plugin.project()
+    poll()
+    name = 'Vendor0Module0Bundle:Check:new.html.twig'
+    views_dir = os.path.join(base_directory, 'src', 'Vendor0', 'Module0Bundle', 'Resources', 'views', 'Check')
+    os.makedirs(views_dir)
+    try:
+        f = open(os.path.join(views_dir, 'new.html.twig'), 'w')
+        f.write('{{ name }}')
+        f.close()
+        poll()
+        assert name in project.templates.names, 'the new template was not found'
+        project.disk_cache.flush()
+        assert name in project.disk_cache.read('templates')['data']['names'], 'the disk cache was not written'
+    finally:
+        shutil.rmtree(views_dir)
+    poll()
+    assert name not in project.templates.names, 'the deleted template was not removed'
+    project.disk_cache.flush()
+    assert name not in project.disk_cache.read('templates')['data']['names']
+    assert sublime.timers and sublime.timers[-1] is SymfonyCommander.pollWatchers, 'the next poll was not scheduled'
+
+
+def checkNarrowing(base_directory):
+    # typing a word character by character gives the same scores and
+    # completions as searching for each prefix at once
+    random.seed(1)
+    words = ['main', 'menu', 'ab', 'um', 'user', 'admin', 'edit', 'show', 'am', 'na']
+    names = ['_'.join([random.choice(words) for k in range(random.randint(1, 4))]) for i in range(300)]
+    names += [random.choice(words).capitalize() + random.choice(words).capitalize() + ':' + random.choice(words) for i in range(100)]
+    index = CompletionIndex(names)
+    for i in range(100):
+        word = ''.join([random.choice('abmnuiedsw_:') for k in range(random.randint(2, 6))])
+        for limit in (0, 20):
+            session = CompletionSession(base_directory, limit)
+            for k in range(1, len(word) + 1):
+                completions = session.complete([(index, False)], k, word[:k], False)
+                states = index.search(word[:k], limit=limit)
+                scores = dict([(state[0], state[1]) for state in states])
+                assert dict([(state[0], state[1]) for state in session.states[0]]) == scores, 'different scores for %r' % word[:k]
+                assert completions == topMatches([index.matches(word[:k], False, states, limit)], limit), word[:k]
+
+
+CHECKS = [checkWorker, checkWorkerCancel, checkConsoleFailure, checkWatcher, checkNarrowing]
+
+
+def main():
+    base_directory = os.path.join(tempfile.gettempdir(), 'symfony-commander-check')
+    generateProject(base_directory, 1, 2, 2, 2, 50, 50, translations=10)
+    for check in CHECKS:
+        started = time.time()
+        check(base_directory)
+        print('%-30s ok %6.2fs' % (check.__name__, time.time() - started))
+    for worker in Indexer.console_workers.values():
+        worker.stop()
+
+
+if __name__ == '__main__':
+    main()
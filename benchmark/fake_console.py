@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+# Stand-in for app/console of a generated project. It prints the canned
+# output of router:debug and container:debug which generate.py wrote to
+# app/benchmark/, so the benchmark measures the plugin and not Symfony.
+import os
+import sys
+
+OUTPUTS = {'router:debug': 'router.txt', 'container:debug': 'container.txt'}
+
+app_dir = os.path.dirname(os.path.abspath(__file__))
+commands = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
+if not commands or commands[0] not in OUTPUTS:
+    sys.stderr.write('fake console: unknown command %s\n' % ' '.join(sys.argv[1:]))
+    sys.exit(1)
+f = open(os.path.join(app_dir, 'benchmark', OUTPUTS[commands[0]]))
+try:
+    sys.stdout.write(f.read())
+finally:
+    f.close()
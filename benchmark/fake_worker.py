@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# Stand-in for console-worker.php on a generated project, speaking the same
+# protocol: one command per line on stdin, its output on stdout followed by
+# a "@@SYMFONY_COMMANDER_DONE@@ <exit code>" line. It knows the canned
+# commands of fake_console.py and "sleep <seconds>", which prints nothing
+# for that long like a hanging command.
+#
+#   python benchmark/fake_worker.py <project root> [env]
+import os
+import sys
+import time
+
+OUTPUTS = {'router:debug': 'router.txt', 'container:debug': 'container.txt'}
+DONE = '@@SYMFONY_COMMANDER_DONE@@'
+
+
+def run(app_dir, line):
+    words = [word for word in line.split() if not word.startswith('-')]
+    if words[0] == 'sleep' and len(words) == 2:
+        time.sleep(float(words[1]))
+        return 0
+    if words[0] not in OUTPUTS:
+        sys.stdout.write('fake worker: unknown command %s\n' % line)
+        return 1
+    f = open(os.path.join(app_dir, 'benchmark', OUTPUTS[words[0]]))
+    try:
+        sys.stdout.write(f.read())
+    finally:
+        f.close()
+    return 0
+
+
+def main():
+    app_dir = os.path.join(sys.argv[1], 'app')
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        code = run(app_dir, line)
+        sys.stdout.write('\n%s %d\n' % (DONE, code))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+# Generates a fake Symfony project for the benchmark:
+#   src/<Vendor>/<Name>Bundle/Entity/*.php (with mapped fields) and Resources/views/**/*.twig
+#   src/<Vendor>/<Name>Bundle/Resources/translations/messages.<locale>.yml|xlf
+#   app/console           prints canned router:debug / container:debug output
+#   app/cache/<env>/      url generator and container dump for index_source auto
+import os
+import shutil
+
+ACTIONS = ('index', 'show', 'new', 'edit', 'delete')
+
+
+def writeFile(path, content):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    f = open(path, 'w')
+    try:
+        f.write(content)
+    finally:
+        f.close()
+
+
+def bundleNames(vendors, bundles):
+    names = []
+    for v in range(vendors):
+        for b in range(bundles):
+            names.append(('Vendor%d' % v, 'Module%dBundle' % b))
+    return names
+
+
+def routeNames(vendors, bundles, routes):
+    # routes are spread over the bundles: vendor0_module1_entity2_show, ...
+    names = []
+    all_bundles = bundleNames(vendors, bundles)
+    for i in range(routes):
+        vendor, bundle = all_bundles[i % len(all_bundles)]
+        j = i // len(all_bundles)
+        names.append('%s_%s_entity%d_%s' % (vendor.lower(), bundle[:-6].lower(), j // len(ACTIONS), ACTIONS[j % len(ACTIONS)]))
+    return names
+
+
+def serviceNames(vendors, bundles, services):
+    names = []
+    all_bundles = bundleNames(vendors, bundles)
+    for i in range(services):
+        vendor, bundle = all_bundles[i % len(all_bundles)]
+        names.append('%s.%s.service%d' % (vendor.lower(), bundle[:-6].lower(), i // len(all_bundles)))
+    return names
+
+
+def entitySource(vendor, bundle, name, fields):
+    # an entity with an id, fields columns and an association to Entity0
+    lines = ['<?php', 'namespace %s\\%s\\Entity;' % (vendor, bundle), '', 'use Doctrine\\ORM\\Mapping as ORM;', '',
+        '/**', ' * @ORM\\Entity', ' */', 'class %s' % name, '{',
+        '    /**', '     * @ORM\\Id', '     * @ORM\\Column(type="integer")', '     */', '    private $id;', '']
+    for f in range(fields):
+        lines.extend(['    /**', '     * @ORM\\Column(type="string", length=255)', '     */', '    private $%s%d;' % (ACTIONS[f % len(ACTIONS)], f), ''])
+    lines.extend(['    /**', '     * @ORM\\ManyToOne(targetEntity="Entity0")', '     */', '    private $parent;', '}'])
+    return '\n'.join(lines) + '\n'
+
+
+def generateSources(base_directory, vendors, bundles, entities, templates, fields=20):
+    for vendor, bundle in bundleNames(vendors, bundles):
+        bundle_dir = os.path.join(base_directory, 'src', vendor, bundle)
+        writeFile(os.path.join(bundle_dir, vendor + bundle + '.php'), '<?php\n')
+        for e in range(entities):
+            writeFile(os.path.join(bundle_dir, 'Entity', 'Entity%d.php' % e), entitySource(vendor, bundle, 'Entity%d' % e, fields))
+            writeFile(os.path.join(bundle_dir, 'Entity', 'Entity%dRepository.php' % e), '<?php\n')
+        for t in range(templates):
+            controller = 'Entity%d' % (t // len(ACTIONS))
+            writeFile(os.path.join(bundle_dir, 'Resources', 'views', controller, ACTIONS[t % len(ACTIONS)] + '.html.twig'), '{# #}\n')
+
+
+def generateTranslations(base_directory, vendors, bundles, keys, locales=('en', 'fr', 'de')):
+    # keys translation keys per bundle, the same in every locale: nested
+    # YAML for the first locale, XLIFF for the others
+    if not keys:
+        return
+    for vendor, bundle in bundleNames(vendors, bundles):
+        translations_dir = os.path.join(base_directory, 'src', vendor, bundle, 'Resources', 'translations')
+        prefix = '%s.%s' % (vendor.lower(), bundle[:-6].lower())
+        names = ['entity%d.%s.%s' % (k // (len(ACTIONS) * 4), ACTIONS[k // 4 % len(ACTIONS)], ('title', 'label', 'help', 'flash')[k % 4])
+            for k in range(keys)]
+        lines = [prefix + ':']
+        last = [None, None]
+        for name in names:
+            entity, action, leaf = name.split('.')
+            if entity != last[0]:
+                lines.append('    %s:' % entity)
+                last = [entity, None]
+            if action != last[1]:
+                lines.append('        %s:' % action)
+                last[1] = action
+            lines.append('            %s: "%s %s %s"' % (leaf, entity, action, leaf))
+        writeFile(os.path.join(translations_dir, 'messages.%s.yml' % locales[0]), '\n'.join(lines) + '\n')
+        for locale in locales[1:]:
+            lines = ['<?xml version="1.0" encoding="utf-8"?>', '<xliff version="1.2" xmlns="urn:oasis:names:tc:xliff:document:1.2">',
+                '  <file source-language="%s" target-language="%s" datatype="plaintext" original="file.ext">' % (locales[0], locale), '    <body>']
+            for i, name in enumerate(names):
+                lines.append('      <trans-unit id="%d"><source>%s.%s</source><target>%s</target></trans-unit>' % (i, prefix, name, name))
+            lines.extend(['    </body>', '  </file>', '</xliff>'])
+            writeFile(os.path.join(translations_dir, 'messages.%s.xlf' % locale), '\n'.join(lines) + '\n')
+
+
+def generateConsole(base_directory, routes, services):
+    app_dir = os.path.join(base_directory, 'app')
+    lines = ['[router] Current routes', 'Name                               Method Pattern']
+    for i, name in enumerate(routes):
+        lines.append('%-34s ANY    /%s/%d' % (name, name.replace('_', '/'), i))
+    writeFile(os.path.join(app_dir, 'benchmark', 'router.txt'), '\n'.join(lines) + '\n')
+    lines = ['[container] Public services', 'Name                               Scope     Class Name']
+    for name in services:
+        lines.append('%-34s container %s' % (name, name.title().replace('.', '\\')))
+    writeFile(os.path.join(app_dir, 'benchmark', 'container.txt'), '\n'.join(lines) + '\n')
+    console = os.path.join(app_dir, 'console')
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_console.py'), console)
+    os.chmod(console, 493)  # 0755
+
+
+def generateCompiled(base_directory, env, routes, services):
+    cache_dir = os.path.join(base_directory, 'app', 'cache', env)
+    kernel = 'app' + env.title()
+    lines = ['<?php', '', 'class %sUrlGenerator extends Symfony\\Component\\Routing\\Generator\\UrlGenerator' % kernel, '{',
+        '    static private $declaredRoutes = array(']
+    for i, name in enumerate(routes):
+        lines.append("        '%s' => array (  0 =>   array (  ),  1 =>   array (  ),  2 =>   array (  ),  3 =>   array ("
+            "    0 =>     array (      0 => 'text',      1 => '/%s/%d',    ),  ),)," % (name, name.replace('_', '/'), i))
+    lines.extend(['    );', '}'])
+    writeFile(os.path.join(cache_dir, kernel + 'UrlGenerator.php'), '\n'.join(lines) + '\n')
+    lines = ['<?xml version="1.0" encoding="utf-8"?>', '<container xmlns="http://symfony.com/schema/dic/services">', '  <services>']
+    for name in services:
+        lines.append('    <service id="%s" class="%s" scope="container"><argument>%s</argument></service>' % (name, name.title().replace('.', '\\'), name))
+    lines.extend(['  </services>', '</container>'])
+    writeFile(os.path.join(cache_dir, kernel + 'DebugProjectContainer.xml'), '\n'.join(lines) + '\n')
+
+
+# written into every generated project, only directories with it are ever
+# deleted again
+MARKER = '.symfony-commander-benchmark'
+
+
+def generateProject(base_directory, vendors=4, bundles=5, entities=20, templates=40, routes=20000, services=20000, env='dev',
+        translations=1000):
+    if os.path.exists(base_directory):
+        if not os.path.isfile(os.path.join(base_directory, MARKER)):
+            raise ValueError('%s exists and was not generated by the benchmark, refusing to delete it' % base_directory)
+        shutil.rmtree(base_directory)
+    writeFile(os.path.join(base_directory, MARKER), 'generated by benchmark/generate.py\n')
+    writeFile(os.path.join(base_directory, 'app', 'AppKernel.php'), '<?php\n')
+    writeFile(os.path.join(base_directory, 'app', 'config', 'config.yml'), 'framework: ~\n')
+    writeFile(os.path.join(base_directory, 'app', 'config', 'routing.yml'), '\n')
+    generateSources(base_directory, vendors, bundles, entities, templates)
+    generateTranslations(base_directory, vendors, bundles, translations)
+    route_names = routeNames(vendors, bundles, routes)
+    service_names = serviceNames(vendors, bundles, services)
+    generateConsole(base_directory, route_names, service_names)
+    # written last, so they are newer than the configuration
+    generateCompiled(base_directory, env, route_names, service_names)
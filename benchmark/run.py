@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# Times the loaders and the autocompletion of SymfonyCommander on a generated
+# project, outside of Sublime Text. Results are written as JSON and can be
+# compared with an earlier run:
+#
+#   python benchmark/run.py --output before.json
+#   ... change SymfonyCommander.py ...
+#   python benchmark/run.py --output after.json --compare before.json
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from optparse import OptionParser
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARK_DIR, 'stubs'), os.path.dirname(BENCHMARK_DIR)]
+
+import sublime
+import SymfonyCommander
+from SymfonyCommander import SymfonyCommanderBase, DirectoryResolver, isProjectRoot, containsBundle
+from generate import generateProject
+
+
+class View(object):
+    # Just enough of a view for loadSettings and on_query_completions: a PHP
+    # file of the project whose cursor is at the end of a quoted string
+    views = 0
+
+    def __init__(self, file_name, text=''):
+        View.views += 1
+        self.view_id = View.views
+        self.path = file_name
+        self.text = "'" + text
+        self.view_settings = sublime.Settings({'syntax': 'Packages/PHP/PHP.tmLanguage'})
+
+    def id(self):
+        return self.view_id
+
+    def settings(self):
+        return self.view_settings
+
+    def file_name(self):
+        return self.path
+
+    def sel(self):
+        return [sublime.Region(len(self.text), len(self.text))]
+
+    def syntax_name(self, point):
+        return 'source.php string.quoted.single.php'
+
+    def extract_scope(self, point):
+        return sublime.Region(0, len(self.text))
+
+    def substr(self, region):
+        return self.text[region.begin():region.end()]
+
+
+def reset():
+    # Forgets everything the plugin keeps between calls, like a restart
+    SymfonyCommanderBase.projects = {}
+    SymfonyCommanderBase.watching = False
+    SymfonyCommanderBase.root_resolver = DirectoryResolver(isProjectRoot)
+    SymfonyCommanderBase.bundle_resolver = DirectoryResolver(containsBundle)
+    del sublime.timers[:]
+
+
+def command(view):
+    plugin = SymfonyCommander.SymfonyCommander(view)
+    plugin.loadSettings()
+    return plugin
+
+
+def finish(load, *args):
+    # Runs a background load and waits until its callback was called
+    done = threading.Event()
+    load(*(args + (done.set,)))
+    done.wait(600)
+
+
+def measure(function, repeat, setup=None):
+    times = []
+    for i in range(repeat):
+        if setup:
+            setup()
+        started = time.time()
+        function()
+        times.append(time.time() - started)
+    times.sort()
+    return {
+        'min': times[0],
+        'median': times[len(times) // 2],
+        'mean': sum(times) / len(times),
+        'max': times[-1],
+        'runs': len(times),
+    }
+
+
+def completionPrefix(search_prefix):
+    # the word Sublime Text passes as prefix, it stops at '.' and ':'
+    return re.split(r'[.:]', search_prefix)[-1]
+
+
+def benchmark(base_directory, options):
+    view_file = os.path.join(base_directory, 'src', 'Vendor0', 'Module0Bundle', 'Entity', 'Entity0.php')
+    view = View(view_file)
+    results = {}
+    sizes = {}
+
+    def cold(index_source='auto', persistent_cache=False):
+        def setup():
+            reset()
+            sublime.settings.update({'index_source': index_source, 'persistent_cache': persistent_cache, 'watch_interval': 0,
+                'php_command': '"%s"' % sys.executable, 'scan_threads': options.threads})
+        return setup
+
+    results['loadSettings'] = measure(lambda: command(view), options.repeat, cold())
+    results['loadSources'] = measure(lambda: finish(command(view).loadSources, True), options.repeat, cold())
+    results['loadRoutes (console)'] = measure(lambda: finish(command(view).loadRoutes, True), options.repeat, cold('console'))
+    results['loadContainer (console)'] = measure(lambda: finish(command(view).loadContainer, True), options.repeat, cold('console'))
+    results['loadRoutes (compiled)'] = measure(lambda: finish(command(view).loadRoutes, True), options.repeat, cold('auto'))
+    results['loadContainer (compiled)'] = measure(lambda: finish(command(view).loadContainer, True), options.repeat, cold('auto'))
+    results['loadTranslations'] = measure(lambda: finish(command(view).loadTranslations, True), options.repeat, cold())
+    results['loadEntityFields'] = measure(lambda: finish(command(view).loadEntityFields, True), options.repeat, cold())
+
+    # fill the disk cache once, then time a restart which reads it
+    cold('auto', True)()
+    plugin = command(view)
+    for load in (plugin.loadRoutes, plugin.loadContainer, plugin.loadSources, plugin.loadTranslations):
+        finish(load, True)
+    project = SymfonyCommanderBase.projects[base_directory]
+    sizes['routes'] = len(project.routes)
+    sizes['services'] = len(project.containers)
+    sizes['entities'] = len(project.entities)
+    sizes['templates'] = len(project.templates)
+    sizes['translations'] = len(project.translations)
+    sizes['bytes'] = project.size()
+    results['loadSettings (disk cache)'] = measure(lambda: command(view), options.repeat, cold('auto', True))
+
+    def restore():
+        plugin = command(view)
+        plugin.waitForRestore(plugin.project())
+    results['restore (disk cache)'] = measure(restore, options.repeat, cold('auto', True))
+
+    # completions with everything loaded
+    cold('auto')()
+    plugin = command(view)
+    for load in (plugin.loadRoutes, plugin.loadContainer, plugin.loadSources, plugin.loadTranslations, plugin.loadEntityFields):
+        finish(load, True)
+    listener = SymfonyCommander.SymfonyCommanderAutocomplete()
+    for search_prefix in ('', 'v', 'vendor1_module2_', 'vendor1_module2_entity3_sh', 'vmes', 'vendor1.module2.serv',
+            'Vendor1Module2Bundle:Entity1:', 'Vendor1Module2Bundle:Ent', 'vendor1.module2.entity3.', 'vendor1.module2.e3sh',
+            'SELECT e FROM Vendor1Module2Bundle:Entity3 e JOIN e.parent p WHERE p.ed'):
+        completion_view = View(view_file, search_prefix)
+        prefix = completionPrefix(search_prefix)
+        count = len(listener.on_query_completions(completion_view, prefix, [len(completion_view.text)]))
+        result = measure(lambda: listener.on_query_completions(completion_view, prefix, [len(completion_view.text)]), options.repeat * 10)
+        result['completions'] = count
+        results['on_query_completions %r' % search_prefix] = result
+
+    # typing a name character by character in the same view
+    for search_prefix in ('vendor1_module2_entity3_show', 'Vendor1Module2Bundle:Entity1:show.html.twig'):
+        def typing():
+            typing_view = View(view_file)
+            for char in search_prefix:
+                typing_view.text += char
+                prefix = completionPrefix(typing_view.text[1:])
+                listener.on_query_completions(typing_view, prefix, [len(typing_view.text)])
+        results['typing %r' % search_prefix] = measure(typing, options.repeat)
+    return results, sizes
+
+
+def revision():
+    try:
+        return subprocess.Popen(['git', 'describe', '--always', '--dirty'], stdout=subprocess.PIPE,
+            cwd=BENCHMARK_DIR).communicate()[0].decode('utf-8').strip()
+    except OSError:
+        return ''
+
+
+def compare(results, previous):
+    print('')
+    print('%-55s %10s %10s %8s' % ('median', 'before', 'after', 'change'))
+    for name in sorted(results):
+        if name in previous['results']:
+            before = previous['results'][name]['median']
+            after = results[name]['median']
+            change = before and (after - before) / before * 100 or 0
+            print('%-55s %9.2fms %9.2fms %+7.1f%%' % (name, before * 1000, after * 1000, change))
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--vendors', type='int', default=4, help='vendor directories in src/')
+    parser.add_option('--bundles', type='int', default=5, help='bundles per vendor')
+    parser.add_option('--entities', type='int', default=20, help='entities per bundle')
+    parser.add_option('--templates', type='int', default=40, help='templates per bundle')
+    parser.add_option('--routes', type='int', default=20000, help='lines of router:debug output')
+    parser.add_option('--services', type='int', default=20000, help='lines of container:debug output')
+    parser.add_option('--translations', type='int', default=1000, help='translation keys per bundle and locale')
+    parser.add_option('--threads', type='int', default=4, help='scan_threads setting')
+    parser.add_option('--repeat', type='int', default=5, help='runs per measurement')
+    parser.add_option('--project', help='where the project is generated (default: a temporary directory)')
+    parser.add_option('--output', help='write the results to this JSON file')
+    parser.add_option('--compare', help='JSON file of an earlier run to compare with')
+    options, args = parser.parse_args()
+
+    base_directory = options.project or os.path.join(tempfile.gettempdir(), 'symfony-commander-benchmark')
+    started = time.time()
+    try:
+        generateProject(base_directory, options.vendors, options.bundles, options.entities, options.templates,
+            options.routes, options.services, translations=options.translations)
+    except ValueError as error:
+        parser.error(str(error))
+    print('generated %s in %.1fs' % (base_directory, time.time() - started))
+
+    results, sizes = benchmark(base_directory, options)
+    print("%(routes)d routes, %(services)d services, %(entities)d entities, %(templates)d templates, %(translations)d translation keys, about %(bytes)d bytes" % sizes)
+    print('')
+    print('%-55s %10s %10s %10s' % ('', 'min', 'median', 'max'))
+    for name in sorted(results):
+        result = results[name]
+        print('%-55s %9.2fms %9.2fms %9.2fms' % (name, result['min'] * 1000, result['median'] * 1000, result['max'] * 1000))
+
+    run = {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'options': dict([(name, getattr(options, name)) for name in ('vendors', 'bundles', 'entities', 'templates', 'routes', 'services', 'translations', 'threads',
+            'repeat')]),
+        'sizes': sizes,
+        'results': results,
+    }
+    if options.output:
+        f = open(options.output, 'w')
+        try:
+            json.dump(run, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+    if options.compare:
+        f = open(options.compare)
+        try:
+            compare(results, json.load(f))
+        finally:
+            f.close()
+
+
+if __name__ == '__main__':
+    main()
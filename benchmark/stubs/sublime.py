@@ -0,0 +1,63 @@
+# Stand-in for the sublime module of Sublime Text 2, just enough to load
+# SymfonyCommander.py outside of the editor. Timeouts are not run on a UI
+# thread: callbacks with a delay are collected in `timers` (and never run by
+# the benchmark), callbacks without a delay are called right away.
+import os
+import tempfile
+
+MONOSPACE_FONT = 1
+ENCODED_POSITION = 1
+TRANSIENT = 4
+
+settings = {}
+timers = []
+packages = os.path.join(tempfile.gettempdir(), 'symfony-commander-benchmark-packages')
+
+
+class Settings(dict):
+    def get(self, key, default=None):
+        return dict.get(self, key, default)
+
+    def set(self, key, value):
+        self[key] = value
+
+
+class Region(object):
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return abs(self.b - self.a)
+
+    def empty(self):
+        return self.a == self.b
+
+
+def load_settings(name):
+    return Settings(settings)
+
+
+def set_timeout(callback, delay):
+    if delay:
+        timers.append(callback)
+    else:
+        callback()
+
+
+def packages_path():
+    return packages
+
+
+def status_message(message):
+    pass
+
+
+def active_window():
+    return None
@@ -0,0 +1,15 @@
+# Stand-in for the sublime_plugin module of Sublime Text 2
+
+
+class TextCommand(object):
+    def __init__(self, view=None):
+        self.view = view
+
+
+class WindowCommand(object):
+    def __init__(self, window=None):
+        self.window = window
+
+
+class EventListener(object):
+    pass
@@ -0,0 +1,48 @@
+<?php
+/*
+ * Long running Symfony console used by the "console_worker" setting of
+ * SymfonyCommander.
+ *
+ * The kernel is booted once, afterwards one command line per line is read
+ * from STDIN and run through the console application. The output of every
+ * command is written to STDOUT and terminated by the line
+ * "@@SYMFONY_COMMANDER_DONE@@ <exit code>".
+ *
+ * Usage: php console-worker.php <project root> [env]
+ */
+
+set_time_limit(0);
+
+$root = rtrim($argv[1], '/\\');
+$env = isset($argv[2]) ? $argv[2] : 'dev';
+
+chdir($root);
+if (file_exists($root.'/app/bootstrap.php.cache')) {
+    require_once $root.'/app/bootstrap.php.cache';
+} else {
+    require_once $root.'/app/autoload.php';
+}
+require_once $root.'/app/AppKernel.php';
+
+$kernel = new AppKernel($env, 'prod' !== $env);
+$application = new Symfony\Bundle\FrameworkBundle\Console\Application($kernel);
+$application->setAutoExit(false);
+
+while (false !== ($line = fgets(STDIN))) {
+    $line = trim($line);
+    if ('' === $line) {
+        continue;
+    }
+    $output = new Symfony\Component\Console\Output\StreamOutput(STDOUT, Symfony\Component\Console\Output\StreamOutput::VERBOSITY_NORMAL, false);
+    // STDIN holds the next commands, a question must not read them
+    $input = new Symfony\Component\Console\Input\StringInput($line);
+    $input->setInteractive(false);
+    try {
+        $code = $application->run($input, $output);
+    } catch (Exception $e) {
+        fwrite(STDOUT, $e->getMessage()."\n");
+        $code = 255;
+    }
+    fwrite(STDOUT, "\n@@SYMFONY_COMMANDER_DONE@@ ".$code."\n");
+    fflush(STDOUT);
+}